@@ -15,12 +15,14 @@ requirements = [
     'wordcloud>=1.7',
     'numpy>=1.23',
     'matplotlib>=3.5',
-    'descartes>=1.1',
+    'pillow>=9.0',
     'pandas>=1.0'
 ]
 
 test_requirements = ['pytest>=3', ]
 
+extras_requirements = {'arrow': ['pyarrow>=7.0']}
+
 setup(
     author="Gabriel da Silva Zech",
     author_email='g.dev@posteo.net',
@@ -36,7 +38,13 @@ setup(
         'Programming Language :: Python :: 3.10'
     ],
     description="A package for creating wordcloud maps in Python.",
+    entry_points={
+        'console_scripts': [
+            'wordcloud-mapper=wordcloud_mapper.cli:main',
+        ],
+    },
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="GNU General Public License v3",
     long_description=readme + '\n\n' + history,
     long_description_content_type="text/x-rst",
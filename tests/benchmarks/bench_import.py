@@ -0,0 +1,26 @@
+"""Benchmarks of importing `wordcloud_mapper` in a fresh interpreter.
+
+Run with ``make benchmark`` or ``pytest tests/benchmarks/bench_*.py``.
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+
+# cold start of short-lived processes, e.g. the command-line interface
+STATEMENTS = {"package": "import wordcloud_mapper",
+              "load_companies": "from wordcloud_mapper import load_companies",
+              "wordcloud_map": "from wordcloud_mapper import wordcloud_map",
+              "cli": "import wordcloud_mapper.cli"}
+
+
+@pytest.mark.parametrize("name", STATEMENTS)
+def test_import(benchmark, name):
+    def run():
+        subprocess.run([sys.executable, "-c", STATEMENTS[name]], check=True)
+
+    benchmark.pedantic(run, rounds=5, warmup_rounds=1)
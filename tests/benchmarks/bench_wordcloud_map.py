@@ -0,0 +1,107 @@
+"""Benchmarks of the stages of `wordcloud_map`.
+
+Run with ``make benchmark`` or ``pytest tests/benchmarks/bench_*.py``.
+"""
+
+from io import BytesIO
+
+import matplotlib.pyplot as plt
+import pytest
+from shapefile import Reader
+
+from wordcloud_mapper import masks, wordcloud_map
+from wordcloud_mapper.wordcloud_map import (get_bbox_map, get_bbox_region,
+                                            get_data, get_data_by_region,
+                                            get_mask, get_shaperecords,
+                                            get_unique_codes, plot_region)
+
+pytest.importorskip("pytest_benchmark")
+
+
+REGION_COUNTS = [4, 16]
+
+
+def get_df(companies, n_regions):
+    """Retrieve the companies of the first ``n_regions`` German regions."""
+    df = companies["DEU"]
+    codes = sorted(df["code"].unique())[:n_regions]
+    return df.loc[df["code"].isin(codes)]
+
+
+@pytest.mark.parametrize("n_regions", REGION_COUNTS)
+def test_load_shapefiles(benchmark, companies, shapefiles_path, n_regions):
+    unique_codes = get_unique_codes(get_df(companies, n_regions), "code")
+
+    def load():
+        return get_shaperecords(Reader(str(shapefiles_path)), unique_codes)
+
+    assert len(benchmark(load)) == n_regions
+
+
+@pytest.mark.parametrize("n_regions", REGION_COUNTS)
+def test_get_bbox_map(benchmark, companies, shapefiles, n_regions):
+    unique_codes = get_unique_codes(get_df(companies, n_regions), "code")
+    shaperecords = get_shaperecords(shapefiles, unique_codes)
+
+    benchmark(get_bbox_map, shaperecords)
+
+
+@pytest.mark.parametrize("border_sharpness", [100, 300])
+def test_get_mask(benchmark, shapefiles, border_sharpness):
+    shaperecord = shapefiles.shapeRecord(0)
+
+    # masks are cached, so time rasterizing them from scratch
+    benchmark.pedantic(get_mask, args=(shaperecord,),
+                       kwargs={"fill_colour": None,
+                               "resolution": border_sharpness},
+                       setup=masks.cache.clear, rounds=20)
+
+
+def test_get_data(benchmark, companies):
+    df = companies["DEU"]
+
+    benchmark(get_data, df, "code", "name", "employees", "DE1", 200)
+
+
+@pytest.mark.parametrize("country", ["DEU", "ITA"])
+def test_get_data_by_region(benchmark, companies, country):
+    df = companies[country]
+
+    benchmark(get_data_by_region, df, "code", "name", "employees", 200)
+
+
+@pytest.mark.parametrize("layout_engine", ["wordcloud", "numpy"])
+@pytest.mark.parametrize("rendering_quality", [1, 2])
+@pytest.mark.parametrize("max_words", [50, 200])
+def test_plot_region(benchmark, companies, shapefiles, max_words,
+                     rendering_quality, layout_engine):
+    shaperecord = shapefiles.shapeRecord(0)
+    mask = get_mask(shaperecord)
+    data = get_data(companies["DEU"], "code", "name", "employees",
+                    shaperecord.record.NUTS_ID, max_words)
+    fig, ax = plt.subplots()
+
+    benchmark(plot_region, mask, data, ax, get_bbox_region(shaperecord),
+              rendering_quality=rendering_quality, max_words=max_words,
+              random_state=0, layout_engine=layout_engine)
+    plt.close(fig)
+
+
+@pytest.mark.parametrize("n_regions", REGION_COUNTS)
+def test_savefig(benchmark, companies, shapefiles_path, n_regions):
+    fig = wordcloud_map(get_df(companies, n_regions), "code", "name",
+                        "employees", shapefiles_path=str(shapefiles_path))
+
+    benchmark(fig.savefig, BytesIO(), format="png")
+    plt.close(fig)
+
+
+@pytest.mark.parametrize("n_regions", REGION_COUNTS)
+def test_wordcloud_map(benchmark, companies, shapefiles_path, n_regions):
+    df = get_df(companies, n_regions)
+
+    def run():
+        plt.close(wordcloud_map(df, "code", "name", "employees",
+                                shapefiles_path=str(shapefiles_path)))
+
+    benchmark.pedantic(run, rounds=3)
@@ -0,0 +1,68 @@
+"""Shared fixtures for `wordcloud_mapper` benchmarks."""
+
+from math import ceil, cos, pi, sin, sqrt
+from zipfile import ZipFile
+
+import pytest
+from shapefile import POLYGON, Reader, Writer
+
+from wordcloud_mapper import load_companies
+
+
+# number of points along each region's border, of the order of the detailed
+# GISCO shapefiles (e.g. border_scale = "01M")
+N_POINTS = 2000
+
+CELL_SIZE = 1e5
+
+
+def get_region(column, row, n_points=N_POINTS):
+    """Create a wiggly clockwise ring filling a grid cell."""
+    centre_x, centre_y = (column + 0.5) * CELL_SIZE, -(row + 0.5) * CELL_SIZE
+    ring = []
+    for i in range(n_points):
+        angle = -2 * pi * i / n_points
+        radius = CELL_SIZE * (0.4 + 0.05 * sin(7 * angle)
+                              + 0.02 * sin(53 * angle + column))
+        ring.append((centre_x + radius * cos(angle),
+                     centre_y + radius * sin(angle)))
+
+    return [ring + ring[:1]]
+
+
+@pytest.fixture(scope="session")
+def companies():
+    """Companies of both bundled countries."""
+    return {country: load_companies(country) for country in ("DEU", "ITA")}
+
+
+@pytest.fixture(scope="session")
+def shapefiles_path(tmp_path_factory, companies):
+    """
+    Path to a zipped shapefile, generated deterministically so benchmarks run
+    offline, containing one region per NUTS code of the bundled companies.
+    """
+    codes = sorted(set().union(*(df["code"] for df in companies.values())))
+    columns = ceil(sqrt(len(codes)))
+
+    directory = tmp_path_factory.mktemp("shapefiles")
+    name = "NUTS_RG_01M_2021_3857"
+    writer = Writer(str(directory / name), shapeType=POLYGON)
+    writer.field("NUTS_ID", "C", size=5)
+    for i, nuts_id in enumerate(codes):
+        writer.poly(get_region(i % columns, i // columns))
+        writer.record(nuts_id)
+    writer.close()
+
+    filepath = directory / f"{name}.shp.zip"
+    with ZipFile(filepath, "w") as archive:
+        for extension in ("shp", "shx", "dbf"):
+            archive.write(directory / f"{name}.{extension}",
+                          f"{name}.{extension}")
+
+    return filepath
+
+
+@pytest.fixture(scope="session")
+def shapefiles(shapefiles_path):
+    return Reader(str(shapefiles_path))
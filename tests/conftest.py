@@ -0,0 +1,46 @@
+"""Shared fixtures for `wordcloud_mapper` tests."""
+
+from zipfile import ZipFile
+
+import pytest
+from shapefile import POLYGON, Writer
+
+
+# simplified NUTS-like regions in EPSG:3857 coordinates, with clockwise
+# exterior rings and counter-clockwise holes as in the GISCO shapefiles
+REGIONS = {
+    "DE1": [[(0, 0), (0, 4e5), (3e5, 4e5), (3e5, 0), (0, 0)]],
+    "DE2": [[(3e5, 0), (3e5, 4e5), (7e5, 4e5), (7e5, 0), (3e5, 0)]],
+    "DE4": [[(0, 4e5), (0, 8e5), (4e5, 8e5), (4e5, 4e5), (0, 4e5)],
+            [(1.5e5, 5.5e5), (2.5e5, 5.5e5), (2.5e5, 6.5e5), (1.5e5, 6.5e5),
+             (1.5e5, 5.5e5)]],
+    "DE3": [[(1.5e5, 5.5e5), (1.5e5, 6.5e5), (2.5e5, 6.5e5), (2.5e5, 5.5e5),
+             (1.5e5, 5.5e5)]],
+    "ITC1": [[(0, -6e5), (0, -3e5), (2e5, -3e5), (2e5, -6e5), (0, -6e5)],
+             [(3e5, -6e5), (3e5, -5e5), (4e5, -5e5), (4e5, -6e5),
+              (3e5, -6e5)]],
+}
+
+
+def write_shapefiles(directory, name="NUTS_RG_60M_2021_3857"):
+    """Write the test regions as a zipped shapefile and return its path."""
+    writer = Writer(str(directory / name), shapeType=POLYGON)
+    writer.field("NUTS_ID", "C", size=5)
+    for nuts_id, rings in REGIONS.items():
+        writer.poly(rings)
+        writer.record(nuts_id)
+    writer.close()
+
+    filepath = directory / f"{name}.shp.zip"
+    with ZipFile(filepath, "w") as archive:
+        for extension in ("shp", "shx", "dbf"):
+            archive.write(directory / f"{name}.{extension}",
+                          f"{name}.{extension}")
+
+    return filepath
+
+
+@pytest.fixture
+def shapefiles_path(tmp_path):
+    """Path to a zipped shapefile containing a handful of NUTS regions."""
+    return write_shapefiles(tmp_path)
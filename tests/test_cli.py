@@ -0,0 +1,78 @@
+"""Tests for `wordcloud_mapper` command-line interface."""
+
+import subprocess
+import sys
+from inspect import signature
+from json import dump
+
+import pytest
+from pandas import DataFrame
+
+from wordcloud_mapper import cli, wordcloud_map
+
+
+@pytest.fixture
+def input_path(tmp_path):
+    filepath = tmp_path / "companies.csv"
+    DataFrame({"year": [2020, 2021, 2020, 2021, 2021],
+               "code": ["DE1", "DE1", "DE2", "DE3", "DE3"],
+               "name": ["bosch", "daimler", "siemens", "bahn", "sap"],
+               "employees": [30, 20, 10, 5, 1]}).to_csv(filepath, index=False)
+    return filepath
+
+
+def test_options():
+    parameters = signature(wordcloud_map).parameters
+    for name, type_, default, description in cli.OPTIONS:
+        assert parameters[name].default == default
+
+
+def test_help_imports():
+    # run in a fresh interpreter, since the tests import everything
+    code = ("import sys\n"
+            "from wordcloud_mapper import cli\n"
+            "try:\n"
+            "    cli.main(['--help'])\n"
+            "except SystemExit:\n"
+            "    print(sorted({'matplotlib', 'pandas', 'wordcloud'} "
+            "& set(sys.modules)))")
+    output = subprocess.run([sys.executable, "-c", code], check=True,
+                            capture_output=True, text=True).stdout
+    assert output.strip().endswith("[]")
+
+
+def test_main(input_path, shapefiles_path, tmp_path):
+    assert cli.main([str(input_path), str(tmp_path / "map.svg"),
+                     "--nuts-codes", "code", "--words", "name",
+                     "--word-counts", "employees", "--scale", "0.5",
+                     "--no-simplify",
+                     "--shapefiles-path", str(shapefiles_path)]) == 0
+    assert (tmp_path / "map.svg").read_text().lstrip().startswith("<?xml")
+
+    with pytest.raises(SystemExit):
+        cli.main([str(input_path), str(tmp_path / "map.png")])
+
+
+def test_manifest(input_path, shapefiles_path, tmp_path, capsys):
+    jobs = [{"input": input_path.name, "output": "map.png",
+             "nuts_codes": "code", "words": "name",
+             "word_counts": "employees"},
+            {"input": input_path.name, "output": "map_{key}.png",
+             "facet": "year", "nuts_codes": "code", "words": "name",
+             "word_counts": "employees", "border_mode": "raster",
+             "shapefiles_path": shapefiles_path.name,
+             "export_layouts": "layouts_{key}.json"},
+            {"input": "missing.csv", "output": "missing.png",
+             "nuts_codes": "code", "words": "name",
+             "word_counts": "employees"}]
+    with open(tmp_path / "jobs.json", "w") as file:
+        dump(jobs, file)
+
+    assert cli.main(["--manifest", str(tmp_path / "jobs.json"),
+                     "--jobs", "2", "--scale", "0.5",
+                     "--shapefiles-path", str(shapefiles_path)]) == 1
+    assert sorted(p.name for p in tmp_path.glob("*.png")) == \
+        ["map.png", "map_2020.png", "map_2021.png"]
+    assert sorted(p.name for p in tmp_path.glob("*.json")) == \
+        ["jobs.json", "layouts_2020.json", "layouts_2021.json"]
+    assert "missing.csv" in capsys.readouterr().err
@@ -2,10 +2,40 @@
 
 """Tests for `wordcloud_mapper` package."""
 
+import subprocess
+import sys
+from importlib import import_module
+
+import matplotlib.pyplot as plt
 import pytest
+from numpy import array, uint8, zeros
+from pandas import DataFrame
+from shapefile import Reader
+from wordcloud.wordcloud import FONT_PATH
+
 
+import wordcloud_mapper
+from wordcloud_mapper import (WordcloudMapRenderer, build_geometry_index,
+                              cache, load_companies, load_layouts,
+                              plot_layout, render_layout, wordcloud_map,
+                              wordcloud_map_batch)
+from wordcloud_mapper import glyphs, masks
+from wordcloud_mapper.aggregate import aggregate_words
+from wordcloud_mapper.colours import get_colour_table
+from wordcloud_mapper.composite import composite, get_pixel_box
+from wordcloud_mapper.placer import get_free_positions, place_words
+from wordcloud_mapper.tables import is_arrow_table, read_parquet_table
+from wordcloud_mapper.simplify import simplify_ring, simplify_shaperecord
+from wordcloud_mapper.wordcloud_map import (download_shapefiles, get_bbox_map,
+                                            generate_regions, get_data,
+                                            get_data_by_region, get_mask,
+                                            get_mask_size,
+                                            get_pixels_per_unit,
+                                            get_unique_codes,
+                                            plot_contours,
+                                            get_shaperecords)
 
-from wordcloud_mapper import wordcloud_mapper
+from .conftest import write_shapefiles
 
 
 @pytest.fixture
@@ -22,3 +52,665 @@ def test_content(response):
     """Sample pytest test function with the pytest fixture as an argument."""
     # from bs4 import BeautifulSoup
     # assert 'GitHub' in BeautifulSoup(response.content).title.string
+
+
+@pytest.fixture
+def gisco(monkeypatch, shapefiles_path):
+    """Serve the test shapefiles in place of GISCO and count downloads."""
+    downloads = []
+    url = shapefiles_path.parent.as_uri() + "/{name}.shp.zip"
+    original = cache.urlopen
+
+    def urlopen(address):
+        downloads.append(address)
+        return original(address)
+
+    monkeypatch.setattr(cache, "GISCO_URL", url)
+    monkeypatch.setattr(cache, "urlopen", urlopen)
+    return downloads
+
+
+def test_shapefiles_cached(tmp_path, gisco):
+    cache_dir = tmp_path / "cache"
+    first = download_shapefiles("60M", 2021, 3857, cache_dir=cache_dir)
+    second = download_shapefiles("60M", 2021, 3857, cache_dir=cache_dir)
+
+    assert len(gisco) == 1
+    assert len(first) == len(second) == 5
+
+
+def test_shapefiles_corrupted_cache(tmp_path, gisco):
+    cache_dir = tmp_path / "cache"
+    filepath = cache.fetch_shapefiles("60M", 2021, 3857, cache_dir=cache_dir)
+    with open(filepath, "ab") as file:
+        file.write(b"garbage")
+    cache.fetch_shapefiles("60M", 2021, 3857, cache_dir=cache_dir)
+
+    assert len(gisco) == 2
+
+
+def test_shapefiles_offline(tmp_path, shapefiles_path):
+    seeded = tmp_path / "seeded" / "shapefiles"
+    seeded.mkdir(parents=True)
+    shapefiles_path.rename(seeded / shapefiles_path.name)
+
+    shapefiles = download_shapefiles("60M", 2021, 3857,
+                                     cache_dir=seeded.parent, offline=True)
+    assert len(shapefiles) == 5
+    with pytest.raises(FileNotFoundError):
+        download_shapefiles("01M", 2021, 3857,
+                            cache_dir=seeded.parent, offline=True)
+
+    # a seeded archive that changed since it was first used is rejected
+    with open(seeded / shapefiles_path.name, "ab") as file:
+        file.write(b"garbage")
+    with pytest.raises(OSError):
+        cache.fetch_shapefiles("60M", 2021, 3857, cache_dir=seeded.parent,
+                               offline=True)
+
+
+def test_cache_eviction(tmp_path, gisco, shapefiles_path):
+    write_shapefiles(shapefiles_path.parent, "NUTS_RG_60M_2016_3857")
+    cache_dir = tmp_path / "cache"
+    for nuts_year in (2016, 2021):
+        cache.fetch_shapefiles("60M", nuts_year, 3857, cache_dir=cache_dir,
+                               max_cache_size=1)
+
+    index = cache.read_index(cache_dir / "shapefiles")
+    assert list(index) == ["NUTS_RG_60M_2021_3857"]
+
+
+@pytest.fixture
+def shapefiles(shapefiles_path):
+    return Reader(str(shapefiles_path))
+
+
+@pytest.fixture
+def df():
+    return DataFrame({"code": ["DE1", "DE1", "DE2", "DE3", "DE3"],
+                      "name": ["bosch", "daimler", "siemens", "bahn", "sap"],
+                      "employees": [30, 20, 10, 5, 1]})
+
+
+def test_lazy_imports():
+    # run in a fresh interpreter, since the tests import everything
+    code = ("import sys, wordcloud_mapper; "
+            "print(sorted({'matplotlib', 'pandas', 'wordcloud', 'shapefile'} "
+            "& set(sys.modules)))")
+    output = subprocess.run([sys.executable, "-c", code], check=True,
+                            capture_output=True, text=True).stdout
+    assert output.strip() == "[]"
+
+    assert wordcloud_mapper.wordcloud_map is wordcloud_map
+    with pytest.raises(AttributeError):
+        wordcloud_mapper.missing
+
+
+def test_get_shaperecords(shapefiles):
+    shaperecords = get_shaperecords(shapefiles, array(["DE3", "DE1", "FR1"]))
+
+    assert [sr.record.NUTS_ID for sr in shaperecords] == ["DE1", "DE3"]
+    assert get_bbox_map(shaperecords) == (0, 0, 3e5, 6.5e5)
+
+
+def test_geometry_index(shapefiles, tmp_path):
+    index = build_geometry_index(shapefiles, tmp_path / "index")
+
+    assert len(index) == 5 and "ITC1" in index
+    for shaperecord in shapefiles.shapeRecords():
+        indexed = index.shapeRecord(shaperecord.record.NUTS_ID)
+        assert tuple(indexed.shape.bbox) == tuple(shaperecord.shape.bbox)
+        assert indexed.__geo_interface__["geometry"] == \
+            shaperecord.__geo_interface__["geometry"]
+    assert [sr.record.NUTS_ID
+            for sr in get_shaperecords(index, ["DE3", "DE1", "FR1"])] == \
+        ["DE1", "DE3"]
+
+
+def test_wordcloud_map(shapefiles, df, tmp_path):
+    build_geometry_index(shapefiles, tmp_path / "index")
+    fig = wordcloud_map(df, "code", "name", "employees", scale=1.0,
+                        geometry_index=tmp_path / "index")
+
+    assert fig.axes[0].get_xlim() == (0, 7e5)
+    plt.close(fig)
+
+
+def test_regions(shapefiles_path, df):
+    fig, stats = wordcloud_map(df, "code", "name", "employees", scale=0.5,
+                               shapefiles_path=str(shapefiles_path),
+                               regions=["DE1", "DE3"], return_stats=True)
+    plt.close(fig)
+
+    assert sorted(stats.regions) == ["DE1", "DE3"]
+
+
+def test_arrow(shapefiles_path, df, tmp_path):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    table = pyarrow.Table.from_pandas(df, preserve_index=False)
+    assert is_arrow_table(table)
+    assert not is_arrow_table(df)
+    assert get_unique_codes(table, "code").tolist() == ["DE1", "DE2", "DE3"]
+    assert get_data_by_region(table, "code", "name", "employees", 1) == \
+        {"DE1": {"bosch": 30}, "DE2": {"siemens": 10}, "DE3": {"bahn": 5}}
+    assert get_data(table, "code", "name", "employees", "DE1", 200) == \
+        get_data(df, "code", "name", "employees", "DE1", 200)
+
+    # rows without NUTS code are skipped, as with DataFrames
+    nulls = pyarrow.Table.from_pydict({"code": [None, "DE1", None],
+                                       "name": ["x", "bosch", "y"],
+                                       "employees": [50, 30, 40]})
+    assert get_unique_codes(nulls, "code").tolist() == ["DE1"]
+    assert get_data_by_region(nulls, "code", "name", "employees", 200) == \
+        {"DE1": {"bosch": 30}}
+
+    filepath = str(tmp_path / "companies.parquet")
+    pyarrow.parquet.write_table(table.append_column(
+        "other", pyarrow.array([0] * len(df))), filepath)
+    table = read_parquet_table(filepath, ["code", "name"], "code", ["DE3"])
+    assert table.column_names == ["code", "name"]
+    assert table["name"].to_pylist() == ["bahn", "sap"]
+
+    fig, stats = wordcloud_map(filepath, "code", "name", "employees",
+                               scale=0.5, regions=["DE1", "DE2"],
+                               shapefiles_path=str(shapefiles_path),
+                               return_stats=True)
+    plt.close(fig)
+    assert "read" in stats.stages
+    assert sorted(stats.regions) == ["DE1", "DE2"]
+
+
+def test_aggregate_words(shapefiles_path, tmp_path):
+    occurrences = [("DE1", "bosch")] * 6 + [("DE1", "daimler")] * 3 \
+        + [("DE1", "audi"), ("DE2", "siemens"), ("DE3", "bahn"), (None, "x")]
+
+    # exact while all words of a region fit
+    df = aggregate_words(iter(occurrences), "code", "name", chunksize=4)
+    assert df.groupby("code").apply(
+        lambda region: dict(zip(region["name"], region["count"]))
+    ).to_dict() == {"DE1": {"bosch": 6, "daimler": 3, "audi": 1},
+                    "DE2": {"siemens": 1}, "DE3": {"bahn": 1}}
+
+    # frequent words are kept and undercounted by at most the error
+    df = aggregate_words(iter(occurrences), "code", "name", max_words=1,
+                         chunksize=4)
+    counts = dict(zip(df["name"], df["count"]))
+    assert list(counts) == ["bosch", "siemens", "bahn"]
+    assert 6 - df.attrs["count_errors"]["DE1"] <= counts["bosch"] < 6
+
+    filepath = tmp_path / "occurrences.csv"
+    DataFrame(occurrences, columns=["code", "name"]).assign(n=2) \
+        .to_csv(filepath, index=False)
+    df = aggregate_words(filepath, "code", "name", "n", max_words=2,
+                         capacity=3)
+    assert dict(zip(df["name"], df["n"])) == \
+        {"bosch": 12, "daimler": 6, "siemens": 2, "bahn": 2}
+    with pytest.raises(ValueError):
+        aggregate_words(filepath, "code", "name", max_words=2, capacity=1)
+
+    fig = wordcloud_map(df, "code", "name", "n", scale=0.5,
+                        shapefiles_path=str(shapefiles_path))
+    plt.close(fig)
+
+
+def test_render_stats(shapefiles_path, df, capsys):
+    events = []
+    fig, stats = wordcloud_map(df, "code", "name", "employees", scale=0.5,
+                               shapefiles_path=str(shapefiles_path),
+                               callback=events.append, trace_memory=True,
+                               return_stats=True)
+
+    assert capsys.readouterr().out == ""
+    assert list(stats.stages) == ["shapefiles", "shaperecords", "figure",
+                                  "simplify", "masks", "borders", "data",
+                                  "wordclouds", "composite"]
+    assert (stats.width, stats.height) == (320, 240)
+    assert stats.peak_memory > 0
+    assert stats.regions["DE1"]["words_requested"] == 2
+    assert stats.regions["DE1"]["words_placed"] == 2
+    assert stats.regions["DE1"]["mask_pixels"] > 0
+    assert {"stage": "wordcloud", "nuts_id": "DE3"} \
+        .items() <= events[-2].items()
+    assert "320px" in str(stats)
+    plt.close(fig)
+
+
+def test_random_state(shapefiles_path, df):
+    def render(df, **kwargs):
+        renderer = WordcloudMapRenderer("code", "name", "employees",
+                                        scale=0.5, random_state=42,
+                                        shapefiles_path=str(shapefiles_path),
+                                        **kwargs)
+        renderer.render(df)
+        plt.close(renderer.fig)
+        return renderer
+
+    first, second = render(df), render(df, n_jobs=2)
+    assert (first.canvas_image.get_array() ==
+            second.canvas_image.get_array()).all()
+
+    # regions are seeded independently of the other regions on the map
+    subset = render(df[df["code"] != "DE2"])
+    for key in ("hue", "random_state"):
+        assert subset.regions["DE3"][key] == first.regions["DE3"][key]
+    assert subset.regions["DE1"]["hue"] != subset.regions["DE3"]["hue"]
+
+
+def test_result_cache(shapefiles_path, df, tmp_path, monkeypatch):
+    def render(**kwargs):
+        fig, stats = wordcloud_map(df, "code", "name", "employees",
+                                   scale=0.5, cache_dir=str(tmp_path),
+                                   shapefiles_path=str(shapefiles_path),
+                                   result_cache=True, return_stats=True,
+                                   **kwargs)
+        plt.close(fig)
+        return fig.axes[0].images[0].get_array(), stats
+
+    first, stats = render(random_state=1)
+    assert not any(region["cached"] for region in stats.regions.values())
+    assert len(list((tmp_path / "results").glob("*.npz"))) == 3
+
+    def generate_region(*args, **kwargs):
+        raise AssertionError("wordcloud was generated again")
+
+    monkeypatch.setattr(import_module("wordcloud_mapper.wordcloud_map"),
+                        "generate_region", generate_region)
+    second, stats = render(random_state=1)
+    assert all(region["cached"] for region in stats.regions.values())
+    assert (first == second).all()
+    assert stats.regions["DE3"]["words_placed"] == 2
+
+    # maps without random_state are not cached
+    with pytest.raises(AssertionError):
+        render()
+
+
+def test_layouts(shapefiles_path, df, tmp_path, monkeypatch):
+    filepath = str(tmp_path / "layouts.json")
+    fig = wordcloud_map(df, "code", "name", "employees", scale=0.5,
+                        shapefiles_path=str(shapefiles_path),
+                        export_layouts=filepath)
+    plt.close(fig)
+    layouts = load_layouts(filepath)
+
+    assert sorted(layouts) == ["DE1", "DE2", "DE3"]
+    width, height = layouts["DE3"]["size"]
+    assert sorted(word[0] for word in layouts["DE3"]["words"]) == \
+        ["bahn", "sap"]
+    assert render_layout(layouts["DE3"], scale=2).shape == \
+        (2 * height, 2 * width, 4)
+
+    def generate_region(*args, **kwargs):
+        raise AssertionError("wordcloud was generated again")
+
+    monkeypatch.setattr(import_module("wordcloud_mapper.wordcloud_map"),
+                        "generate_region", generate_region)
+    fig, stats = wordcloud_map(df, "code", "name", "employees", scale=1.0,
+                               shapefiles_path=str(shapefiles_path),
+                               layouts=filepath, return_stats=True)
+    plt.close(fig)
+
+    assert all(region["replayed"] for region in stats.regions.values())
+    assert stats.regions["DE3"]["words_placed"] == 2
+    monkeypatch.undo()
+
+    # regions whose data changed are generated again, also in later renders
+    renderer = WordcloudMapRenderer("code", "name", "employees", scale=0.5,
+                                    shapefiles_path=str(shapefiles_path),
+                                    layouts=filepath)
+    for name in ("infineon", "bosch"):
+        df.loc[0, "name"] = name
+        plt.close(renderer.render(df))
+        assert not renderer.stats.regions["DE1"]["replayed"]
+        assert name in [word[0] for word in
+                        renderer.get_layouts()["DE1"]["words"]]
+    assert "DE1" not in renderer.layouts
+    assert renderer.layouts["DE3"] == layouts["DE3"]
+
+    # layouts without the digest of their data are not replayed
+    del layouts["DE3"]["data"]
+    renderer = WordcloudMapRenderer("code", "name", "employees", scale=0.5,
+                                    shapefiles_path=str(shapefiles_path),
+                                    layouts=layouts)
+    plt.close(renderer.render(df))
+    assert not renderer.stats.regions["DE3"]["replayed"]
+
+
+def test_plot_layout():
+    layout = {"size": [200, 100],
+              "words": [["x", 1.0, 60, 10, 20, False, "rgb(0, 0, 0)"],
+                        ["sap", 1.0, 20, 160, 10, True, "rgb(0, 0, 0)"]]}
+    fig = plt.figure(figsize=(2, 1), dpi=100)
+    ax = fig.add_axes([0., 0., 1., 1.], xlim=(0, 2), ylim=(0, 1))
+    ax.set_axis_off()
+    plot_layout(layout, ax, (0, 2, 0, 1))
+    fig.canvas.draw()
+    vector = array(fig.canvas.buffer_rgba())[:, :, 0] < 128
+    plt.close(fig)
+    raster = render_layout(layout)[:, :, 3] > 128
+
+    # the words' ink is where WordCloud draws it, up to font rendering
+    for window in (slice(None, 100), slice(100, None)):
+        for image in (vector, raster):
+            assert image[:, window].any()
+        for axis in (0, 1):
+            assert abs(vector[:, window].any(axis).argmax()
+                       - raster[:, window].any(axis).argmax()) <= 3
+
+
+def test_get_free_positions():
+    occupied = (array(range(48)).reshape(6, 8) % 7 == 0).astype(uint8)
+    integral = zeros((7, 9), dtype="int32")
+    integral[1:, 1:] = occupied.cumsum(0).cumsum(1)
+
+    free, columns = get_free_positions(integral, 2, 3)
+    expected = [row * columns + column
+                for row in range(5) for column in range(6)
+                if not occupied[row:row + 2, column:column + 3].any()]
+    assert free.tolist() == expected
+    assert get_free_positions(integral, 7, 1)[0].size == 0
+
+
+def test_place_words():
+    mask = zeros((120, 200, 4), dtype=uint8)
+    mask[:, :100, :3] = 255
+    data = {"bosch": 30, "daimler": 20, "siemens": 10, "bahn": 5, "sap": 1}
+
+    def colour_func(word, **kwargs):
+        return "hsl(0, 100%, 50%)"
+
+    layout = place_words(mask, data, colour_func, random_state=1)
+    assert layout == place_words(mask, data, colour_func, random_state=1)
+    assert layout["size"] == [200, 120]
+    assert [word[0] for word in layout["words"]] == list(data)
+
+    # words are placed in the free half and do not overlap
+    words = [render_layout({"size": layout["size"], "words": [word]})
+             [:, :, 3] > 0 for word in layout["words"]]
+    assert not any(word[:, :100].any() for word in words)
+    assert sum(word.astype(int) for word in words).max() == 1
+
+    with pytest.raises(ValueError):
+        place_words(mask, {}, colour_func)
+
+
+def test_layout_engine(shapefiles_path, df):
+    engines = []
+
+    def engine(mask, data, colour_func, **kwargs):
+        engines.append(sorted(data))
+        return place_words(mask, data, colour_func, **kwargs)
+
+    fig, stats = wordcloud_map(df, "code", "name", "employees", scale=0.5,
+                               shapefiles_path=str(shapefiles_path),
+                               layout_engine=engine, return_stats=True)
+    plt.close(fig)
+
+    assert sorted(engines) == [["bahn", "sap"], ["bosch", "daimler"],
+                               ["siemens"]]
+    assert stats.regions["DE1"]["words_placed"] == 2
+
+    with pytest.raises(ValueError):
+        WordcloudMapRenderer("code", "name", "employees",
+                             layout_engine="spiral")
+
+
+def test_renderer(shapefiles_path, df, monkeypatch):
+    generated = []
+
+    def spy(masks, data, *args, **kwargs):
+        generated.append([list(words) for words in data])
+        return generate_regions(masks, data, *args, **kwargs)
+
+    monkeypatch.setattr(import_module("wordcloud_mapper.wordcloud_map"),
+                        "generate_regions", spy)
+    renderer = WordcloudMapRenderer("code", "name", "employees", scale=1.0,
+                                    shapefiles_path=str(shapefiles_path))
+    fig = renderer.render(df)
+    df.loc[2, "employees"] = 15
+
+    assert renderer.render(df) is fig
+    assert generated == [[["bosch", "daimler"], ["siemens"], ["bahn", "sap"]],
+                         [["siemens"]]]
+    assert len(fig.axes[0].images) == 1
+    plt.close(fig)
+
+    renderer = WordcloudMapRenderer("code", "name", "employees", scale=1.0,
+                                    shapefiles_path=str(shapefiles_path),
+                                    compositing="layers")
+    assert len(renderer.render(df).axes[0].images) == 3
+    plt.close(renderer.fig)
+
+    renderer = WordcloudMapRenderer("code", "name", "employees", scale=1.0,
+                                    shapefiles_path=str(shapefiles_path),
+                                    compositing="vector")
+    ax = renderer.render(df).axes[0]
+    assert len(ax.images) == 0
+    assert sorted(text.get_text() for text in ax.texts) == \
+        ["bahn", "bosch", "daimler", "sap", "siemens"]
+    df.loc[2, "name"] = "infineon"
+    renderer.render(df)
+    assert sorted(text.get_text() for text in ax.texts) == \
+        ["bahn", "bosch", "daimler", "infineon", "sap"]
+    plt.close(renderer.fig)
+
+    # words are sized for masks with the regions' aspect ratio
+    with pytest.raises(ValueError):
+        WordcloudMapRenderer("code", "name", "employees", mask_size="fixed",
+                             compositing="vector")
+
+
+def test_wordcloud_map_batch(shapefiles_path, df, tmp_path):
+    df = df.assign(year=[2020, 2021, 2020, 2021, 2021])
+    n_figures = len(plt.get_fignums())
+    batch = wordcloud_map_batch(df, "year", "code", "name", "employees",
+                                scale=0.5,
+                                shapefiles_path=str(shapefiles_path))
+
+    key, fig = next(batch)
+    assert key == 2020 and fig.axes[0].get_xlim() == (0, 7e5)
+    key, fig = next(batch)
+    assert key == 2021 and fig.axes[0].get_ylim() == (0, 6.5e5)
+    assert len(plt.get_fignums()) == n_figures + 1
+    batch.close()
+    assert len(plt.get_fignums()) == n_figures
+
+    images = dict(wordcloud_map_batch(df, "year", "code", "name",
+                                      "employees", format="png", scale=0.5,
+                                      shapefiles_path=str(shapefiles_path)))
+    assert list(images) == [2020, 2021]
+    assert all(image.startswith(b"\x89PNG") for image in images.values())
+
+    filepath = str(tmp_path / "layouts_{key}.json")
+    for key, image, stats in wordcloud_map_batch(
+            df, "year", "code", "name", "employees", format="png", scale=0.5,
+            shapefiles_path=str(shapefiles_path), return_stats=True,
+            export_layouts=filepath):
+        assert sorted(load_layouts(filepath.format(key=key))) == \
+            sorted(stats.regions)
+    with pytest.raises(ValueError):
+        next(wordcloud_map_batch(df, "year", "code", "name", "employees",
+                                 export_layouts=str(tmp_path / "a.json")))
+
+
+def test_composite():
+    red = zeros((2, 2, 4), dtype=uint8)
+    red[:, :, 0] = red[:, :, 3] = 255
+    blue = zeros((2, 2, 4), dtype=uint8)
+    blue[:, :, 2] = 255
+    blue[:, :, 3] = 128
+    canvas = composite([(red, 0, 0), (blue, 1, 1), (blue, 5, 5)], 3, 3)
+
+    assert get_pixel_box((0, 10, 0, 10), (0, 0, 30, 30), 3, 3) == (0, 2, 1, 1)
+    assert canvas[0, 0].tolist() == [255, 0, 0, 255]
+    assert canvas[1, 1].tolist() == [127, 0, 128, 255]
+    assert canvas[2, 2].tolist() == [0, 0, 255, 128]
+    assert canvas[0, 2].tolist() == [0, 0, 0, 0]
+
+
+def test_get_mask(shapefiles):
+    shaperecord = shapefiles.shapeRecord(2)  # DE4, which has a hole
+    mask = get_mask(shaperecord, resolution=100)
+    contour = get_mask(shaperecord, fill_colour=None, resolution=100)
+
+    assert mask.shape == contour.shape == (480, 640, 4)
+    assert tuple(mask[60, 80]) == (0, 0, 0, 255)
+    assert tuple(mask[240, 320]) == (255, 255, 255, 0)  # inside the hole
+    assert tuple(contour[60, 80]) == (255, 255, 255, 0)
+    assert tuple(contour[0, 80]) == (0, 0, 0, 77)
+
+
+def test_mask_cache(shapefiles, tmp_path, monkeypatch):
+    masks.cache.clear()
+    shaperecord = shapefiles.shapeRecord(2)
+    mask = get_mask(shaperecord, size=(120, 90), cache_dir=tmp_path)
+    assert len(list(tmp_path.glob("*.npz"))) == 1
+
+    def rasterize_geometry(*args, **kwargs):
+        raise AssertionError("mask was rasterized again")
+
+    monkeypatch.setattr(masks, "rasterize_geometry", rasterize_geometry)
+    assert (get_mask(shaperecord, size=(120, 90)) == mask).all()
+    masks.cache.clear()
+    assert (get_mask(shaperecord, size=(120, 90), cache_dir=tmp_path)
+            == mask).all()
+
+
+def test_glyph_cache(monkeypatch):
+    glyphs.clear_cache()
+    glyph = glyphs.get_glyph("bosch", 20)
+    assert glyph.shape[0] < glyph.shape[1]
+    assert glyphs.get_glyph("bosch", 20, rotated=True).shape == \
+        glyph.shape[::-1]
+    assert glyphs.get_glyph("bosch", 20) is glyph
+    assert not glyph.flags.writeable
+
+    # the least recently used glyphs are dropped beyond the cache size
+    monkeypatch.setattr(glyphs, "CACHE_SIZE", glyph.nbytes * 3)
+    glyphs.get_glyph("bosch", 20)
+    glyphs.get_glyph("daimler", 20)
+    assert list(glyphs.cache) == [(FONT_PATH, "bosch", 20, False),
+                                  (FONT_PATH, "daimler", 20, False)]
+    assert glyphs.cache_bytes == sum(glyph.nbytes
+                                     for glyph in glyphs.cache.values())
+    glyphs.clear_cache()
+    assert glyphs.cache_bytes == 0
+
+
+def test_get_mask_size(shapefiles):
+    shaperecords = shapefiles.shapeRecords()
+    Xmin, Ymin, Xmax, Ymax = get_bbox_map(shaperecords)  # 7e5 by 1.4e6
+    fig = plt.figure(figsize=(6.4, 4.8), dpi=100)
+    ax = fig.add_axes([0., 0., 1., 1.], xlim=(Xmin, Xmax), ylim=(Ymin, Ymax),
+                      aspect="equal")
+    pixels_per_unit = get_pixels_per_unit(ax)
+    plt.close(fig)
+    shaperecord = shaperecords[0]  # DE1, 3e5 wide and 4e5 tall
+
+    # the map fills the figure's height only
+    assert pixels_per_unit == pytest.approx((480 / 1.4e6, 480 / 1.4e6))
+    assert get_mask_size(shaperecord, pixels_per_unit) == (103, 137)
+    assert get_mask(shaperecord, size=(300, 400)).shape == (400, 300, 4)
+
+
+def test_mask_size_on_map(shapefiles_path, df):
+    for rendering_quality in (1, 2):
+        renderer = WordcloudMapRenderer("code", "name", "employees", scale=1,
+                                        rendering_quality=rendering_quality,
+                                        shapefiles_path=str(shapefiles_path))
+        plt.close(renderer.render(df))
+
+        # masks are the size of the regions on screen, while the canvas and
+        # the wordclouds on it keep the words' rendering quality
+        extent = renderer.ax.get_window_extent()
+        assert renderer.canvas.shape[1::-1] == (
+            round(extent.width * rendering_quality),
+            round(extent.height * rendering_quality))
+        for region in renderer.regions.values():
+            box = region["box"][2:]
+            mask_size = region["mask"].shape[1::-1]
+            assert all(abs(a * rendering_quality - b) <= rendering_quality
+                       for a, b in zip(mask_size, box))
+            if region["tile"] is not None:
+                assert region["tile"].shape[1::-1] == box
+
+
+def test_raster_borders_on_canvas(shapefiles_path, df):
+    alpha = {}
+    for border_sharpness in (100, 400):
+        renderer = WordcloudMapRenderer("code", "name", "employees",
+                                        scale=1, border_mode="raster",
+                                        border_sharpness=border_sharpness,
+                                        shapefiles_path=str(shapefiles_path))
+        plt.close(renderer.render(df))
+        alpha[border_sharpness] = renderer.regions["DE2"]["contour"][:, :, 3]
+
+    # sharper borders are smoothed rather than drawn wider
+    assert alpha[100].max() == 77
+    assert alpha[400].sum() == pytest.approx(alpha[100].sum(), rel=0.25)
+    assert ((alpha[400] > 0) & (alpha[400] < 77)).any()
+
+
+def test_generate_regions_parallel(shapefiles):
+    masks = [get_mask(shaperecord, size=(120, 90))
+             for shaperecord in shapefiles.shapeRecords()[:3]]
+    data = [{"bosch": 30, "daimler": 20, "siemens": 10}] * 3
+    hues, random_states = [0, 120, 240], [1, 2, 3]
+
+    sequential = generate_regions(masks, data, hues, random_states, n_jobs=1)
+    parallel = generate_regions(masks, data, hues, random_states, n_jobs=2)
+
+    assert all((a == b).all() for a, b in zip(sequential, parallel))
+
+
+def test_get_data_by_region():
+    df = load_companies("ITA")
+    df.loc[0, "name"] = None
+    data_by_region = get_data_by_region(df, "code", "name", "employees", 10)
+
+    assert set(data_by_region) == set(df["code"])
+    for nuts_code, data in data_by_region.items():
+        expected = get_data(df, "code", "name", "employees", nuts_code, 10)
+        assert list(data.values()) == list(expected.values())
+        assert data == expected
+
+
+def test_colour_table():
+    data = {"a": 10, "b": 30, "c": 20, "d": 10}
+
+    assert get_colour_table(data, 5, "frequency") == {
+        "a": "hsl(5, 100%, 0.0%)", "b": "hsl(5, 100%, 50.0%)",
+        "c": "hsl(5, 100%, 25.0%)", "d": "hsl(5, 100%, 0.0%)"}
+    assert get_colour_table(data, 5, "rank") == {
+        "a": "hsl(5, 100%, 0.0%)", "b": "hsl(5, 100%, 37.5%)",
+        "c": "hsl(5, 100%, 25.0%)", "d": "hsl(5, 100%, 12.5%)"}
+
+
+def test_plot_contours(shapefiles):
+    fig, ax = plt.subplots()
+    plot_contours(shapefiles.shapeRecords(), ax)
+
+    assert len(ax.collections) == 1
+    assert len(ax.collections[0].get_segments()) == 7
+    plt.close(fig)
+
+
+def test_simplify(shapefiles):
+    # square with 100 points along each side, plus a triangle
+    side = [(x, 0.0) for x in range(100)]
+    square = side + [(100.0, y) for y, _ in side] \
+        + [(100.0 - x, 100.0) for x, _ in side] \
+        + [(0.0, 100.0 - y) for y, _ in side] + [(0.0, 0.0)]
+    triangle = [(0, 0), (1, 1), (2, 0), (0, 0)]
+
+    assert simplify_ring(square, 0.5).tolist() == \
+        [[0, 0], [100, 0], [100, 100], [0, 100], [0, 0]]
+    assert len(simplify_ring(triangle, 10)) == 4
+
+    shaperecord = shapefiles.shapeRecord(2)
+    simplified = simplify_shaperecord(shaperecord, 1.0)
+    assert simplified is simplify_shaperecord(shaperecord, 1.0)
+    assert simplified.__geo_interface__["geometry"] == \
+        shaperecord.__geo_interface__["geometry"]
@@ -1,9 +1,58 @@
 """Top-level package for wordcloud_mapper."""
 
-from .wordcloud_map import wordcloud_map
-from .load_companies import load_companies
-from .resize_map import resize_map
+import sys
+from importlib import import_module
+from types import ModuleType
 
 __author__ = """Gabriel da Silva Zech"""
 __email__ = 'g.dev@posteo.net'
 __version__ = '0.2.0'
+
+# public names and the modules they are imported from on first access, so
+# that importing the package does not import matplotlib, wordcloud or pandas
+EXPORTS = {"WordcloudMapRenderer": "wordcloud_map",
+           "wordcloud_map": "wordcloud_map",
+           "wordcloud_map_batch": "wordcloud_map",
+           "load_companies": "load_companies",
+           "resize_map": "resize_map",
+           "build_geometry_index": "geometry_index",
+           "RenderStats": "stats",
+           "load_layouts": "layout",
+           "plot_layout": "layout",
+           "render_layout": "layout",
+           "save_layouts": "layout",
+           "place_words": "placer",
+           "aggregate_words": "aggregate"}
+
+__all__ = list(EXPORTS)
+
+
+def __getattr__(name):
+    if name not in EXPORTS:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(f".{EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(EXPORTS))
+
+
+class Package(ModuleType):
+    """
+    The package's module, which keeps functions named like their module
+    (e.g. ``wordcloud_map``) from being replaced by the module once it is
+    imported.
+    """
+
+    def __setattr__(self, name, value):
+        if isinstance(value, ModuleType) and EXPORTS.get(name) == name:
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = Package
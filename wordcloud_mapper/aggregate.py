@@ -0,0 +1,202 @@
+from itertools import chain, islice
+from os import PathLike, path
+
+from pandas import DataFrame, Series, concat, read_csv
+
+from .tables import import_pyarrow
+
+
+def read_chunks(source,
+                columns,
+                chunksize):
+    """
+    Read a source of word occurrences in chunks of at most ``chunksize`` rows.
+
+    Parameters
+    ----------
+    source : str, DataFrame, pyarrow.Table or iterable
+        Path to a CSV file, Parquet file or directory of Parquet files, a
+        single DataFrame or pyarrow Table, or an iterable of DataFrames,
+        pyarrow Tables or RecordBatches, dictionaries or tuples ordered like
+        ``columns``.
+    columns : list of str
+        Names of the columns to read.
+    chunksize : int
+        Maximum number of rows per chunk for files and iterables of records.
+
+    Yields
+    ------
+    DataFrame
+        Chunk containing the given columns.
+
+    """
+    if isinstance(source, (str, PathLike)):
+        if path.isdir(source) or str(source).endswith(".parquet"):
+            pyarrow = import_pyarrow()
+            import pyarrow.dataset
+
+            dataset = pyarrow.dataset.dataset(source, format="parquet")
+            for batch in dataset.to_batches(columns=columns,
+                                            batch_size=chunksize):
+                yield batch.to_pandas()
+        else:
+            yield from read_csv(source, usecols=columns, chunksize=chunksize)
+        return
+
+    if isinstance(source, DataFrame) or hasattr(source, "to_pandas"):
+        source = [source]
+
+    records = iter(source)
+    for first in records:
+        if isinstance(first, DataFrame):
+            yield first[columns]
+        elif hasattr(first, "to_pandas"):
+            yield first.select(columns).to_pandas()
+        else:
+            chunk = list(chain([first], islice(records, chunksize - 1)))
+            if isinstance(first, dict):
+                yield DataFrame(chunk)[columns]
+            else:
+                yield DataFrame(chunk, columns=columns)
+
+
+def merge_counts(summary,
+                 chunk,
+                 nuts_codes,
+                 words,
+                 word_counts,
+                 capacity):
+    """
+    Merge word counts into the per-region summary of the most frequent
+    words, keeping at most ``capacity`` words per region with the mergeable
+    Misra-Gries algorithm: the counts are added up and, in each region with
+    more words than ``capacity``, the count of the first word that does not
+    fit is subtracted from all counts and the words left without a count are
+    dropped.
+
+    Parameters
+    ----------
+    summary : DataFrame
+        Counts of the most frequent words of each region so far, with columns
+        ``nuts_codes``, ``words`` and ``word_counts``.
+    chunk : DataFrame
+        Counts to merge, with the same columns.
+    nuts_codes : str
+        Name of the column containing the NUTS codes.
+    words : str
+        Name of the column containing the words.
+    word_counts : str
+        Name of the column containing the word counts.
+    capacity : int
+        Maximum number of words kept per region.
+
+    Returns
+    -------
+    tuple
+        Tuple containing the merged summary and a Series with the NUTS codes
+        as index and the count subtracted in each region as values.
+
+    """
+    merged = concat([summary, chunk], ignore_index=True) \
+        .groupby([nuts_codes, words], sort=False, observed=True)[word_counts] \
+        .sum().reset_index() \
+        .sort_values([nuts_codes, word_counts], ascending=[True, False],
+                     kind="stable")
+    rank = merged.groupby(nuts_codes, sort=False, observed=True).cumcount()
+
+    # count of the first word not fitting into each full region
+    overflow = merged.loc[rank == capacity]
+    subtracted = Series(overflow[word_counts].to_numpy(),
+                        index=overflow[nuts_codes].to_numpy())
+
+    counts = merged[word_counts] - merged[nuts_codes].map(subtracted) \
+        .fillna(0).astype(merged[word_counts].dtype)
+    merged = merged.assign(**{word_counts: counts}) \
+        .loc[(rank < capacity) & (counts > 0)]
+
+    return merged.reset_index(drop=True), subtracted
+
+
+def aggregate_words(source,
+                    nuts_codes,
+                    words,
+                    word_counts=None,
+                    max_words=200,
+                    capacity=None,
+                    chunksize=1000000):
+    """
+    Count the occurrences of words in each region in a single pass over data
+    larger than memory, keeping only the most frequent words of each region.
+    The occurrences are read in chunks, which are counted exactly and merged
+    into a summary of at most ``capacity`` words per region (see
+    ``merge_counts()``), so memory use depends on the chunk size and the
+    number of regions, not on the size of the data.
+
+    The counts of the kept words are underestimated by at most the total
+    count subtracted in their region, which is stored for each region in
+    the ``"count_errors"`` entry of the returned DataFrame's ``attrs`` and is
+    at most the number of occurrences in the region divided by
+    ``capacity + 1``. Words that are more frequent than that are always kept.
+
+    Parameters
+    ----------
+    source : str, DataFrame, pyarrow.Table or iterable
+        The word occurrences. Either a path to a CSV file, Parquet file or
+        directory of Parquet files, a DataFrame or pyarrow Table, or an
+        iterable of DataFrames, pyarrow Tables or RecordBatches, or of
+        records given as dictionaries or as tuples of NUTS code, word and (if
+        ``word_counts`` is given) count.
+    nuts_codes : str
+        Name of the column containing the NUTS codes.
+    words : str
+        Name of the column containing the words.
+    word_counts : str or None (default = None)
+        Name of the column containing the number of occurrences of each
+        row's word. If None, every row is a single occurrence.
+    max_words : int (default = 200)
+        The number of words to plot on each wordcloud.
+    capacity : int or None (default = None)
+        Number of words counted per region. Larger values give more accurate
+        counts of the less frequent words at the cost of memory. If None,
+        ``max_words`` is used.
+    chunksize : int (default = 1000000)
+        Number of rows counted at once.
+
+    Returns
+    -------
+    DataFrame
+        DataFrame containing columns with the NUTS codes, the words and their
+        counts (named ``word_counts``, or ``"count"`` if None) of the
+        ``max_words`` most frequent words of each region, to be passed to
+        ``wordcloud_map()``.
+
+    """
+    if capacity is None:
+        capacity = max_words
+    if capacity < max_words:
+        raise ValueError("capacity must be at least max_words.")
+    columns = [nuts_codes, words] + ([word_counts] if word_counts else [])
+    counts_name = word_counts or "count"
+
+    summary = DataFrame({nuts_codes: [], words: [], counts_name: []})
+    errors = Series(dtype="float64")
+    for chunk in read_chunks(source, columns, chunksize):
+        chunk = chunk.dropna(subset=[nuts_codes, words])
+        if word_counts:
+            chunk = chunk.groupby([nuts_codes, words], sort=False,
+                                  observed=True)[word_counts].sum()
+        else:
+            chunk = chunk.groupby([nuts_codes, words], sort=False,
+                                  observed=True).size()
+        chunk = chunk.rename(counts_name).reset_index()
+        if summary.empty:
+            summary = summary.astype(chunk.dtypes)
+        summary, subtracted = merge_counts(summary, chunk, nuts_codes, words,
+                                           counts_name, capacity)
+        errors = errors.add(subtracted, fill_value=0)
+
+    summary = summary.groupby(nuts_codes, sort=False, observed=True) \
+        .head(max_words).reset_index(drop=True)
+    summary.attrs["count_errors"] = errors.to_dict()
+
+    return summary
@@ -0,0 +1,315 @@
+from hashlib import sha256
+from json import dump, load
+from os import environ, makedirs, path, remove, replace, utime
+from tempfile import NamedTemporaryFile
+from urllib.request import urlopen
+from zipfile import is_zipfile
+
+
+GISCO_URL = "https://gisco-services.ec.europa.eu/distribution/v2/nuts/shp/\
+{name}.shp.zip"
+
+DEFAULT_MAX_CACHE_SIZE = 1024 ** 3  # 1 GB
+
+INDEX_FILE = "index.json"
+
+CHUNK_SIZE = 1024 ** 2
+
+
+def get_cache_dir(cache_dir=None):
+    """
+    Retrieve the directory used to cache files locally and create it if it
+    does not exist yet.
+
+    Parameters
+    ----------
+    cache_dir : str or None (default = None)
+        Path to the cache directory. If None, the path given by the
+        ``WORDCLOUD_MAPPER_CACHE`` environment variable is used or, if that is
+        not set, ``~/.cache/wordcloud_mapper``.
+
+    Returns
+    -------
+    str
+        Path to the cache directory.
+
+    """
+    if cache_dir is None:
+        cache_dir = environ.get("WORDCLOUD_MAPPER_CACHE")
+    if cache_dir is None:
+        cache_home = environ.get("XDG_CACHE_HOME",
+                                 path.join(path.expanduser("~"), ".cache"))
+        cache_dir = path.join(cache_home, "wordcloud_mapper")
+    makedirs(cache_dir, exist_ok=True)
+
+    return cache_dir
+
+
+def get_shapefiles_name(shapes_scale="10M",
+                        nuts_year=2021,
+                        coord_system=4326):
+    """
+    Retrieve the name used by GISCO for a given NUTS shapefiles archive.
+
+    Parameters
+    ----------
+    shapes_scale : str (default = "10M")
+        Scale used for the regions' polygon shapes.
+    nuts_year : int (default = 2021)
+        The year of NUTS regulation.
+    coord_system : int (default = 4326)
+        4-digit EPSG code of the coordinate system.
+
+    Returns
+    -------
+    str
+        Name of the archive without its ``.shp.zip`` extension, e.g.
+        ``"NUTS_RG_10M_2021_4326"``.
+
+    """
+    return f"NUTS_RG_{shapes_scale}_{nuts_year}_{coord_system}"
+
+
+def hash_file(filepath):
+    """
+    Calculate the SHA-256 digest of a file.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the file.
+
+    Returns
+    -------
+    str
+        Hexadecimal SHA-256 digest of the file's content.
+
+    """
+    digest = sha256()
+    with open(filepath, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def read_index(cache_dir):
+    """
+    Read the index of a cache directory, which maps each cached item to the
+    file holding it and its SHA-256 digest.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Path to the cache directory.
+
+    Returns
+    -------
+    dict
+        Dictionary containing the index entries. Empty if the index does not
+        exist or cannot be read.
+
+    """
+    try:
+        with open(path.join(cache_dir, INDEX_FILE), encoding="utf-8") as file:
+            return load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_index(cache_dir, index):
+    """
+    Write the index of a cache directory. The index is written to a temporary
+    file first, so concurrent readers never see a partially written index.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Path to the cache directory.
+    index : dict
+        Dictionary containing the index entries.
+
+    """
+    with NamedTemporaryFile("w", dir=cache_dir, suffix=".tmp",
+                            delete=False, encoding="utf-8") as file:
+        dump(index, file, indent=1, sort_keys=True)
+    replace(file.name, path.join(cache_dir, INDEX_FILE))
+
+
+def evict(cache_dir, index, max_cache_size, keep=()):
+    """
+    Delete the least recently used files in a cache directory until the
+    cached files take up at most ``max_cache_size`` bytes. Seeded files (i.e.
+    files placed in the cache directory by the user) are never deleted.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Path to the cache directory.
+    index : dict
+        Dictionary containing the index entries. Modified in place.
+    max_cache_size : int or None
+        Maximum size of the cache in bytes. If None, nothing is deleted.
+    keep : iterable of str (default = ())
+        Keys of entries that must not be deleted.
+
+    """
+    if max_cache_size is None:
+        return
+
+    entries = []
+    for key, entry in index.items():
+        filepath = path.join(cache_dir, entry["file"])
+        try:
+            last_used = path.getmtime(filepath)
+        except OSError:
+            last_used = 0
+        entries.append((last_used, key, filepath))
+
+    total_size = sum(entry["size"] for entry in index.values())
+    for last_used, key, filepath in sorted(entries):
+        if total_size <= max_cache_size:
+            break
+        entry = index[key]
+        if key in keep or entry.get("seeded", False):
+            continue
+        if path.exists(filepath):
+            remove(filepath)
+        total_size -= entry["size"]
+        del index[key]
+
+
+def download_file(url, cache_dir):
+    """
+    Download a file into a cache directory, naming it by the SHA-256 digest
+    of its content.
+
+    Parameters
+    ----------
+    url : str
+        URL of the file.
+    cache_dir : str
+        Path to the cache directory.
+
+    Returns
+    -------
+    dict
+        Index entry of the downloaded file.
+
+    """
+    digest = sha256()
+    size = 0
+    with urlopen(url) as response, \
+            NamedTemporaryFile("wb", dir=cache_dir, suffix=".tmp",
+                               delete=False) as file:
+        expected_size = response.headers.get("Content-Length")
+        for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            file.write(chunk)
+            size += len(chunk)
+
+    if (expected_size is not None and int(expected_size) != size) \
+            or not is_zipfile(file.name):
+        remove(file.name)
+        raise OSError(f"Incomplete or corrupted download from {url}.")
+
+    filename = f"{digest.hexdigest()}.shp.zip"
+    replace(file.name, path.join(cache_dir, filename))
+
+    return {"file": filename, "sha256": digest.hexdigest(), "size": size}
+
+
+def fetch_shapefiles(shapes_scale="10M",
+                     nuts_year=2021,
+                     coord_system=4326,
+                     cache_dir=None,
+                     max_cache_size=DEFAULT_MAX_CACHE_SIZE,
+                     offline=False):
+    """
+    Retrieve the path to a local copy of a NUTS shapefiles archive from
+    Eurostat's GISCO database, downloading it only if it is not cached yet.
+
+    Archives are stored in the cache directory under the SHA-256 digest of
+    their content and checked against it every time they are used. Corrupted
+    files are discarded and downloaded again. Archives named as in GISCO's
+    database (e.g. ``NUTS_RG_10M_2021_4326.shp.zip``) that are placed in the
+    ``shapefiles`` subdirectory of the cache directory beforehand are used as
+    well, which allows seeding the cache of machines without internet access.
+    Seeded archives are checked against their digest when first used, and an
+    error is raised if they change afterwards.
+
+    Parameters
+    ----------
+    shapes_scale : str (default = "10M")
+        Scale used for the regions' polygon shapes.
+    nuts_year : int (default = 2021)
+        The year of NUTS regulation.
+    coord_system : int (default = 4326)
+        4-digit EPSG code of the coordinate system.
+    cache_dir : str or None (default = None)
+        Path to the cache directory. See :func:`get_cache_dir`.
+    max_cache_size : int or None (default = 1 GB)
+        Maximum size of the cache in bytes. The least recently used archives
+        are deleted when it is exceeded. If None, the cache is unbounded.
+    offline : bool (default = False)
+        If True, never access the network and raise an error if the archive
+        is not cached.
+
+    Returns
+    -------
+    str
+        Path to the cached archive.
+
+    Raises
+    ------
+    OSError
+        If a seeded archive is not a ZIP file or changed since it was first
+        used.
+
+    """
+    cache_dir = path.join(get_cache_dir(cache_dir), "shapefiles")
+    makedirs(cache_dir, exist_ok=True)
+    name = get_shapefiles_name(shapes_scale, nuts_year, coord_system)
+    index = read_index(cache_dir)
+
+    # check integrity of the cached archive
+    entry = index.get(name)
+    if entry is not None:
+        filepath = path.join(cache_dir, entry["file"])
+        if path.exists(filepath) and hash_file(filepath) == entry["sha256"]:
+            utime(filepath)
+            return filepath
+        if path.exists(filepath) and entry.get("seeded", False):
+            # seeded archives cannot be downloaded again in offline mode,
+            # so they are never replaced silently
+            raise OSError(
+                f"The seeded archive {filepath} changed since it was first "
+                "used and may be corrupted. Replace it with an intact copy, "
+                "or delete it to download or seed the archive again.")
+        if path.exists(filepath):
+            remove(filepath)
+        del index[name]
+
+    # use archive seeded by the user
+    seeded = path.join(cache_dir, f"{name}.shp.zip")
+    if path.exists(seeded):
+        if not is_zipfile(seeded):
+            raise OSError(f"The seeded archive {seeded} is not a ZIP file.")
+        index[name] = {"file": path.basename(seeded),
+                       "sha256": hash_file(seeded),
+                       "size": path.getsize(seeded),
+                       "seeded": True}
+        write_index(cache_dir, index)
+        return seeded
+
+    if offline:
+        raise FileNotFoundError(
+            f"{name}.shp.zip is not cached in {cache_dir} and offline mode is "
+            "on. Place the archive in this directory or turn offline mode "
+            "off.")
+
+    index[name] = download_file(GISCO_URL.format(name=name), cache_dir)
+    evict(cache_dir, index, max_cache_size, keep=(name,))
+    write_index(cache_dir, index)
+
+    return path.join(cache_dir, index[name]["file"])
@@ -0,0 +1,314 @@
+"""Console script for wordcloud_mapper."""
+
+import sys
+from argparse import SUPPRESS, ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from json import load
+from os import path
+
+from .cache import DEFAULT_MAX_CACHE_SIZE
+
+
+# matplotlib, pandas and wordcloud are only imported once a map is made, so
+# that e.g. --help responds quickly
+
+COLUMNS = ("nuts_codes", "words", "word_counts")
+
+# options of wordcloud_map() that can be given on the command line, as
+# (name, type, default, description) tuples
+OPTIONS = (
+    ("scale", float, 2.0, "The scale of the produced figure."),
+    ("rendering_quality", int, 1,
+     "The rendering quality of the words in the wordcloud."),
+    ("colour_func", str, "random",
+     "Colour function to use: 'random', 'frequency' or 'rank'."),
+    ("colour_hue", int, None,
+     "Hue in the HSL colour system used for all regions."),
+    ("min_font_size", int, 4, "Smallest font size to use."),
+    ("max_font_size", int, None, "Maximum font size for the largest word."),
+    ("max_words", int, 200,
+     "Maximum number of words in the wordcloud of each region."),
+    ("relative_scaling", float, 0.5,
+     "Importance of relative word frequencies for font-size."),
+    ("prefer_horizontal", float, 0.9,
+     "The ratio of times to try horizontal fitting as opposed to vertical."),
+    ("repeat", bool, False,
+     "Whether to repeat already-placed words until max_words or "
+     "min_font_size is reached."),
+    ("border_scale", str, "01M",
+     "How detailed the regions' borders are, e.g. '60M' or '01M'."),
+    ("border_sharpness", float, 100,
+     "How sharp the regions' border lines look in raster border mode."),
+    ("nuts_year", int, 2021, "The year of NUTS regulation."),
+    ("coord_system", int, 3857,
+     "4-digit EPSG code of the coordinate system: 4326, 3035 or 3857."),
+    ("shapefiles_path", str, None,
+     "Local .shp or .zip file to read the shapefiles from instead of "
+     "downloading them."),
+    ("cache_dir", str, None,
+     "Directory where downloaded shapefiles and other files are cached."),
+    ("offline", bool, False,
+     "Whether to only use shapefiles cached in cache_dir."),
+    ("geometry_index", str, None,
+     "Geometry index to read the regions' shapes from instead of "
+     "shapefiles."),
+    ("mask_size", str, "bbox",
+     "How the size of each region's mask is chosen: 'bbox' or 'fixed'."),
+    ("mask_pixels_per_unit", float, None,
+     "Number of mask pixels per unit of the coordinate system."),
+    ("n_jobs", int, 1,
+     "Number of worker processes generating the regions' wordclouds."),
+    ("border_mode", str, "vector",
+     "How the regions' border lines are drawn: 'vector' or 'raster'."),
+    ("simplify", bool, True,
+     "Whether to simplify the regions' shapes before using them."),
+    ("mask_cache", bool, False,
+     "Whether to cache the regions' rasterized masks on disk."),
+    ("compositing", str, "canvas",
+     "How the regions' wordclouds are combined into the map: 'canvas', "
+     "'layers' or 'vector'."),
+    ("random_state", int, None,
+     "Seed of the random numbers used to make the map."),
+    ("result_cache", bool, False,
+     "Whether to cache the regions' wordclouds on disk."),
+    ("result_cache_size", int, DEFAULT_MAX_CACHE_SIZE,
+     "Maximum size of the result cache in bytes."),
+    ("layouts", str, None,
+     "JSON file of layouts saved with export_layouts to draw the regions "
+     "from."),
+    ("export_layouts", str, None,
+     "JSON file the layouts of the regions' wordclouds are saved to."),
+    ("layout_engine", str, "wordcloud",
+     "How the words are placed within the regions: 'wordcloud' or "
+     "'numpy'."),
+)
+
+# options holding file paths, resolved relative to a job manifest
+PATHS = ("input", "output", "shapefiles_path", "cache_dir", "geometry_index",
+         "layouts", "export_layouts")
+
+
+def read_table(filepath,
+               columns=None):
+    """
+    Read a CSV or Parquet file into a DataFrame.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the file. Files ending with ``.parquet`` or ``.pq`` are read
+        as Parquet files, all other files as CSV files.
+    columns : list of str or None (default = None)
+        Names of the columns to read. If None, all columns are read.
+
+    Returns
+    -------
+    DataFrame
+        DataFrame object containing the file's data.
+
+    """
+    from pandas import read_csv, read_parquet
+
+    if filepath.endswith((".parquet", ".pq")):
+        return read_parquet(filepath, columns=columns)
+
+    return read_csv(filepath, usecols=columns)
+
+
+def run_job(job):
+    """
+    Create the wordcloud map(s) of a job and save them.
+
+    Parameters
+    ----------
+    job : dict
+        Dictionary containing the ``input`` and ``output`` file paths, the
+        names of the ``nuts_codes``, ``words`` and ``word_counts`` columns, an
+        optional ``facet`` column and any options of ``wordcloud_map()``. With
+        a facet column, one map is saved per value of the column, replacing
+        ``{key}`` in the output path (and in the ``export_layouts`` path, if
+        given) with the value.
+
+    Returns
+    -------
+    list of str
+        Paths to the saved maps.
+
+    """
+    import matplotlib.pyplot as plt
+
+    from .wordcloud_map import wordcloud_map, wordcloud_map_batch
+
+    job = dict(job)
+    input_path, output_path = job.pop("input"), job.pop("output")
+    facet = job.pop("facet", None)
+    columns = [job[name] for name in COLUMNS]
+
+    if facet is None:
+        # wordcloud_map() reads only the columns it needs from Parquet files
+        df = input_path if input_path.endswith((".parquet", ".pq")) \
+            else read_table(input_path, columns)
+        fig = wordcloud_map(df, *columns, **{key: value
+                                             for key, value in job.items()
+                                             if key not in COLUMNS})
+        fig.savefig(output_path)
+        plt.close(fig)
+        return [output_path]
+
+    if "{key}" not in output_path:
+        raise ValueError(
+            "output must contain '{key}' when a facet column is given.")
+
+    df = read_table(input_path, columns + [facet])
+    format = path.splitext(output_path)[1].lstrip(".") or None
+    outputs = []
+    for key, image in wordcloud_map_batch(df, facet, format=format, **job):
+        filepath = output_path.format(key=key)
+        with open(filepath, "wb") as file:
+            file.write(image)
+        outputs.append(filepath)
+
+    return outputs
+
+
+def read_manifest(filepath,
+                  defaults=None):
+    """
+    Read the jobs of a job manifest. Relative paths in the jobs, i.e. the
+    input and output and options such as ``shapefiles_path`` or
+    ``layouts``, are interpreted relative to the manifest's directory.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to a JSON file containing a list of jobs (see ``run_job()``).
+    defaults : dict or None (default = None)
+        Dictionary containing values used for keys missing from a job, whose
+        paths are left as they are.
+
+    Returns
+    -------
+    list of dict
+        The jobs.
+
+    """
+    with open(filepath, encoding="utf-8") as file:
+        manifest = load(file)
+
+    directory = path.dirname(path.abspath(filepath))
+    jobs = []
+    for job in manifest:
+        for key in PATHS:
+            if isinstance(job.get(key), str):
+                job[key] = path.join(directory, job[key])
+        jobs.append({**(defaults or {}), **job})
+
+    return jobs
+
+
+def get_parser():
+    """Create the parser of the command-line arguments."""
+    parser = ArgumentParser(
+        prog="wordcloud-mapper",
+        description="Create wordcloud maps from CSV or Parquet files and "
+        "save them as images, e.g. PNG or SVG files.")
+    parser.add_argument("input", nargs="?",
+                        help="CSV or Parquet file containing the data.")
+    parser.add_argument("output", nargs="?",
+                        help="Image file the map is saved to. Its extension "
+                        "sets the format.")
+    parser.add_argument("--manifest",
+                        help="JSON file containing a list of jobs, each "
+                        "giving an input, an output, the column names and "
+                        "options. Options given on the command line are "
+                        "used for all jobs.")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of maps created in parallel worker "
+                        "processes. If -1, all CPUs are used.")
+
+    columns = parser.add_argument_group("columns")
+    columns.add_argument("--nuts-codes", default=SUPPRESS,
+                         help="Column containing the NUTS codes.")
+    columns.add_argument("--words", default=SUPPRESS,
+                         help="Column containing the words.")
+    columns.add_argument("--word-counts", default=SUPPRESS,
+                         help="Column containing the word counts.")
+    columns.add_argument("--facet", default=SUPPRESS,
+                         help="Column whose values split the data into one "
+                         "map each. The output (and --export-layouts, if "
+                         "given) must then contain '{key}', which is "
+                         "replaced with the value.")
+
+    options = parser.add_argument_group("map options",
+                                        "See wordcloud_map() for details.")
+    for name, type_, default, description in OPTIONS:
+        flag = "--" + name.replace("_", "-")
+        if type_ is bool and default:
+            options.add_argument("--no-" + flag[2:], dest=name,
+                                 action="store_false", default=SUPPRESS,
+                                 help=f"Set {name} to False. {description}")
+        elif type_ is bool:
+            options.add_argument(flag, action="store_true", default=SUPPRESS,
+                                 help=f"Set {name} to True. {description}")
+        else:
+            options.add_argument(flag, type=type_, default=SUPPRESS,
+                                 help=f"{description} Default: {default}.")
+
+    return parser
+
+
+def use_agg_backend():
+    """
+    Select matplotlib's non-interactive Agg backend, since the console script
+    only saves maps to files, which skips loading an interactive backend.
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def main(args=None):
+    """Console script for wordcloud_mapper."""
+    parser = get_parser()
+    args = vars(parser.parse_args(args))
+    manifest, n_jobs = args.pop("manifest"), args.pop("jobs")
+
+    if manifest is not None:
+        jobs = read_manifest(manifest, {key: value
+                                        for key, value in args.items()
+                                        if key not in ("input", "output")})
+    elif args["input"] is None or args["output"] is None:
+        parser.error("input and output are required without --manifest.")
+    else:
+        jobs = [args]
+
+    for job in jobs:
+        missing = [name for name in COLUMNS if name not in job]
+        if missing:
+            parser.error("missing column names: " + ", ".join(missing))
+
+    use_agg_backend()
+    errors = 0
+    with ProcessPoolExecutor(n_jobs if n_jobs > 0 else None,
+                             initializer=use_agg_backend) as executor:
+        if n_jobs == 1 or len(jobs) == 1:
+            results = [partial(run_job, job) for job in jobs]
+        else:
+            results = [executor.submit(run_job, job).result for job in jobs]
+
+        # report the jobs in the order given, but keep going on errors
+        for job, result in zip(jobs, results):
+            try:
+                for filepath in result():
+                    print(f"Saved {filepath}")
+            except Exception as error:
+                errors += 1
+                print(f"Error in job {job['input']} -> {job['output']}: "
+                      f"{error}", file=sys.stderr)
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
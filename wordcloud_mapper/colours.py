@@ -0,0 +1,91 @@
+from numpy import argsort, arange, empty, fromiter
+
+
+def get_luminosities(data,
+                     colour_func="frequency",
+                     min_luminosity=0,
+                     max_luminosity=50):
+    """
+    Calculate the luminosity of every word of a region at once.
+
+    Parameters
+    ----------
+    data : dict
+        Dictionary containing the words as keys and their count as values for
+        the given NUTS region.
+    colour_func : str (default = "frequency")
+        String indicating which colour function to use. Available values:
+        ``"frequency"`` sets the luminosity of each word according to their
+        frequency/word count, where the most frequent word receives
+        ``max_luminosity`` and the least frequent word ``min_luminosity``.
+        ``"rank"`` sets the luminosity of each word according to their rank,
+        where the word with rank=1 receives ``max_luminosity``.
+    min_luminosity : float (default = 0)
+        Lower end of the luminosity ramp, between 0 and 100.
+    max_luminosity : float (default = 50)
+        Upper end of the luminosity ramp, between 0 and 100.
+
+    Returns
+    -------
+    ndarray
+        Array containing the luminosity of each word, in the order of
+        ``data``.
+
+    """
+    counts = fromiter(data.values(), dtype=float, count=len(data))
+    ramp = max_luminosity - min_luminosity
+
+    if colour_func == "frequency":
+        # normalise frequencies
+        spread = counts.max() - counts.min() if len(counts) else 0
+        if spread == 0:
+            return counts * 0 + max_luminosity
+        return min_luminosity + ramp * (counts - counts.min()) / spread
+
+    elif colour_func == "rank":
+        # position of each word when sorted according to ascending values
+        ranks = empty(len(counts))
+        ranks[argsort(counts, kind="stable")] = arange(len(counts))
+        return min_luminosity + ramp * ranks / len(counts)
+
+    raise ValueError(
+        f"colour_func must be 'frequency' or 'rank', got {colour_func!r}.")
+
+
+def get_colour_table(data,
+                     hue,
+                     colour_func="frequency",
+                     min_luminosity=0,
+                     max_luminosity=50):
+    """
+    Create a lookup table with the colour of every word of a region, so that
+    colouring a word does not depend on the number of words in the region.
+
+    Parameters
+    ----------
+    data : dict
+        Dictionary containing the words as keys and their count as values for
+        the given NUTS region.
+    hue : int
+        Hue in the HSL colour system used for all words of the region.
+    colour_func : str (default = "frequency")
+        String indicating which colour function to use. Available values:
+        ``"frequency"`` or ``"rank"``. See ``get_luminosities()``.
+    min_luminosity : float (default = 0)
+        Lower end of the luminosity ramp, between 0 and 100.
+    max_luminosity : float (default = 50)
+        Upper end of the luminosity ramp, between 0 and 100.
+
+    Returns
+    -------
+    dict
+        Dictionary containing the words as keys and strings containing their
+        HSL colour values as values.
+
+    """
+    luminosities = get_luminosities(data, colour_func, min_luminosity,
+                                    max_luminosity)
+    sat = 100
+
+    return {word: "hsl({}, {}%, {}%)".format(hue, sat, lum)
+            for word, lum in zip(data, luminosities.tolist())}
@@ -0,0 +1,124 @@
+from numpy import asarray, clip, divide, float32, rint, uint8, zeros
+from PIL import Image
+
+
+def get_pixel_box(bbox,
+                  bbox_map,
+                  width,
+                  height):
+    """
+    Retrieve the pixels a region's bounding box covers on the map's canvas.
+
+    Parameters
+    ----------
+    bbox : tuple
+        Tuple containing (minX, maxX, minY, maxY) bounding box values of the
+        region.
+    bbox_map : tuple
+        Tuple containing (Xmin, Ymin, Xmax, Ymax) bounding box values of the
+        map.
+    width : int
+        Width of the canvas in pixels.
+    height : int
+        Height of the canvas in pixels.
+
+    Returns
+    -------
+    tuple
+        Tuple containing the (left, top, width, height) of the region on the
+        canvas in pixels, where (left, top) may lie outside of the canvas.
+
+    """
+    minX, maxX, minY, maxY = bbox
+    Xmin, Ymin, Xmax, Ymax = bbox_map
+    scale_x = width / (Xmax - Xmin)
+    scale_y = height / (Ymax - Ymin)
+
+    left, right = rint([(minX - Xmin) * scale_x, (maxX - Xmin) * scale_x])
+    top, bottom = rint([(Ymax - maxY) * scale_y, (Ymax - minY) * scale_y])
+
+    return (int(left), int(top),
+            max(1, int(right - left)), max(1, int(bottom - top)))
+
+
+def resize_tile(img_array,
+                size):
+    """
+    Resample an RGBA image to the size it takes up on the map's canvas.
+
+    Parameters
+    ----------
+    img_array : ndarray
+        RGBA image of shape (height, width, 4) and dtype uint8.
+    size : tuple
+        Tuple containing the width and height of the tile in pixels.
+
+    Returns
+    -------
+    ndarray
+        RGBA image of shape (height, width, 4) and dtype uint8.
+
+    """
+    if img_array.shape[1::-1] == tuple(size):
+        return img_array
+
+    # PIL resamples RGBA images with premultiplied alpha, so the colours of
+    # transparent pixels do not bleed into the edges of the words
+    image = Image.fromarray(img_array, mode="RGBA")
+    return asarray(image.resize(tuple(size), Image.LANCZOS))
+
+
+def composite(tiles,
+              width,
+              height,
+              canvas=None):
+    """
+    Alpha-blend RGBA tiles onto a single canvas, in the order given.
+
+    Parameters
+    ----------
+    tiles : list of tuple
+        List of (img_array, left, top) tuples, where img_array is an RGBA
+        image of dtype uint8 and (left, top) is its position on the canvas in
+        pixels. Tiles are clipped to the canvas.
+    width : int
+        Width of the canvas in pixels.
+    height : int
+        Height of the canvas in pixels.
+    canvas : ndarray or None (default = None)
+        Preallocated array of shape (height, width, 4) and dtype float32 used
+        to blend the tiles, which is overwritten. If None, a new one is
+        allocated.
+
+    Returns
+    -------
+    ndarray
+        RGBA image of shape (height, width, 4) and dtype uint8.
+
+    """
+    if canvas is None:
+        canvas = zeros((height, width, 4), dtype=float32)
+    else:
+        canvas.fill(0)
+
+    # blend with premultiplied colours, i.e. canvas = tile + canvas * (1 - a)
+    for img_array, left, top in tiles:
+        tile_height, tile_width = img_array.shape[:2]
+        x0, y0 = max(left, 0), max(top, 0)
+        x1, y1 = min(left + tile_width, width), min(top + tile_height, height)
+        if x0 >= x1 or y0 >= y1:
+            continue
+
+        tile = img_array[y0 - top:y1 - top, x0 - left:x1 - left] \
+            .astype(float32) / 255
+        alpha = tile[:, :, 3:]
+        tile[:, :, :3] *= alpha
+        target = canvas[y0:y1, x0:x1]
+        target *= 1 - alpha
+        target += tile
+
+    alpha = canvas[:, :, 3:]
+    divide(canvas[:, :, :3], alpha, out=canvas[:, :, :3], where=alpha > 0)
+    canvas *= 255
+
+    return rint(clip(canvas, 0, 255)).astype(uint8)
@@ -0,0 +1,274 @@
+from collections import namedtuple
+from os import makedirs, path
+
+from numpy import array, asarray, concatenate, cumsum, float64, int64, load, \
+    save
+
+
+ARRAYS = ("ids", "bboxes", "region_offsets", "polygon_offsets",
+          "ring_offsets", "coords")
+
+IndexedRecord = namedtuple("IndexedRecord", ["NUTS_ID"])
+
+
+class IndexedShape:
+    """
+    Polygon shape of a single NUTS region read from a geometry index. Mimics
+    the attributes of ``shapefile.Shape`` used to create wordcloud maps.
+
+    Parameters
+    ----------
+    polygons : list of list of ndarray
+        Polygons of the region, each given as a list of rings (the exterior
+        ring followed by its holes) with one (x, y) row per point.
+    bbox : tuple
+        Tuple containing (minX, minY, maxX, maxY) bounding box values of the
+        region.
+
+    """
+
+    def __init__(self, polygons, bbox):
+        self.polygons = polygons
+        self.bbox = bbox
+
+    @property
+    def points(self):
+        """ndarray : All points of the shape, one (x, y) row per point."""
+        return concatenate([ring for polygon in self.polygons
+                            for ring in polygon])
+
+    @property
+    def parts(self):
+        """list of int : Index of the first point of each ring."""
+        lengths = [len(ring) for polygon in self.polygons for ring in polygon]
+        return [0] + list(cumsum(lengths[:-1], dtype=int64))
+
+    @property
+    def __geo_interface__(self):
+        coordinates = [[list(map(tuple, ring.tolist())) for ring in polygon]
+                       for polygon in self.polygons]
+        if len(coordinates) == 1:
+            return {"type": "Polygon", "coordinates": coordinates[0]}
+        return {"type": "MultiPolygon", "coordinates": coordinates}
+
+
+class IndexedShapeRecord:
+    """
+    Shape and record of a single NUTS region read from a geometry index.
+    Mimics the attributes of ``shapefile.ShapeRecord`` used to create
+    wordcloud maps.
+
+    Parameters
+    ----------
+    shape : IndexedShape
+        Polygon shape of the region.
+    record : IndexedRecord
+        Record of the region, containing its ``NUTS_ID``.
+
+    """
+
+    def __init__(self, shape, record):
+        self.shape = shape
+        self.record = record
+
+    @property
+    def __geo_interface__(self):
+        return {"type": "Feature",
+                "properties": self.record._asdict(),
+                "geometry": self.shape.__geo_interface__}
+
+
+class GeometryIndex:
+    """
+    Geometry index of NUTS regions created with
+    :func:`build_geometry_index`. The index's arrays are memory-mapped, so
+    only the coordinates of the regions that are accessed are read from disk.
+
+    Parameters
+    ----------
+    index_path : str
+        Path to the directory containing the geometry index.
+
+    """
+
+    def __init__(self, index_path):
+        for name in ARRAYS:
+            setattr(self, name, load(path.join(index_path, f"{name}.npy"),
+                                     mmap_mode="r"))
+        self.positions = {str(nuts_id): i
+                          for i, nuts_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, nuts_id):
+        return nuts_id in self.positions
+
+    def bbox(self, nuts_id):
+        """
+        Retrieve the bounding box values of a region.
+
+        Parameters
+        ----------
+        nuts_id : str
+            NUTS code of the region.
+
+        Returns
+        -------
+        tuple
+            Tuple containing (minX, minY, maxX, maxY) bounding box values of
+            the region.
+
+        """
+        return tuple(float(value)
+                     for value in self.bboxes[self.positions[nuts_id]])
+
+    def shapeRecord(self, nuts_id):
+        """
+        Retrieve the shape and record of a region.
+
+        Parameters
+        ----------
+        nuts_id : str
+            NUTS code of the region.
+
+        Returns
+        -------
+        IndexedShapeRecord
+            Shape and record of the region.
+
+        """
+        i = self.positions[nuts_id]
+        polygons = []
+        for p in range(self.region_offsets[i], self.region_offsets[i + 1]):
+            rings = []
+            for r in range(self.polygon_offsets[p],
+                           self.polygon_offsets[p + 1]):
+                start, stop = self.ring_offsets[r], self.ring_offsets[r + 1]
+                rings.append(array(self.coords[start:stop]))
+            polygons.append(rings)
+
+        return IndexedShapeRecord(IndexedShape(polygons, self.bbox(nuts_id)),
+                                  IndexedRecord(str(nuts_id)))
+
+    def shapeRecords(self, nuts_ids=None):
+        """
+        Retrieve the shapes and records of several regions, in the order in
+        which they are stored in the index.
+
+        Parameters
+        ----------
+        nuts_ids : iterable of str or None (default = None)
+            NUTS codes of the regions. Codes not contained in the index are
+            ignored. If None, all regions are retrieved.
+
+        Returns
+        -------
+        list of IndexedShapeRecord
+            Shapes and records of the regions.
+
+        """
+        if nuts_ids is None:
+            nuts_ids = self.positions
+        positions = sorted(self.positions[nuts_id] for nuts_id in nuts_ids
+                           if nuts_id in self.positions)
+
+        return [self.shapeRecord(self.ids[i]) for i in positions]
+
+
+def get_polygons(geometry):
+    """
+    Retrieve the polygons of a GeoJSON-like Polygon or MultiPolygon geometry.
+
+    Parameters
+    ----------
+    geometry : dict
+        GeoJSON-like dictionary, e.g. the ``__geo_interface__`` of a shape.
+
+    Returns
+    -------
+    list of list
+        Polygons of the geometry, each given as a list of rings (the exterior
+        ring followed by its holes).
+
+    """
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+
+    raise ValueError(f"Unsupported geometry type {geometry['type']}.")
+
+
+def get_rings(shape):
+    """
+    Retrieve the rings (i.e. the exterior boundaries and holes) of a polygon
+    shape.
+
+    Parameters
+    ----------
+    shape : shapefile.Shape or IndexedShape
+        Polygon shape of a NUTS region.
+
+    Returns
+    -------
+    list of ndarray
+        Rings of the shape, with one (x, y) row per point.
+
+    """
+    points = asarray(shape.points, dtype=float64)[:, :2]
+    starts = list(shape.parts)
+    stops = starts[1:] + [len(points)]
+
+    return [points[start:stop] for start, stop in zip(starts, stops)]
+
+
+def build_geometry_index(shapefiles,
+                         index_path):
+    """
+    Build a geometry index from NUTS shapefiles, so the shapes of single
+    regions can later be read without parsing the whole shapefile. The index
+    is a directory of NumPy arrays holding the NUTS codes, the bounding boxes
+    and the coordinates of all regions.
+
+    Parameters
+    ----------
+    shapefiles : shapefile.Reader
+        Reader object of shapefile module containing shapefiles of NUTS
+        regions.
+    index_path : str
+        Path to the directory where the geometry index is saved.
+
+    Returns
+    -------
+    GeometryIndex
+        The geometry index.
+
+    """
+    ids, bboxes, coords = [], [], []
+    region_offsets, polygon_offsets, ring_offsets = [0], [0], [0]
+
+    for shaperecord in shapefiles.iterShapeRecords():
+        ids.append(shaperecord.record.NUTS_ID)
+        bboxes.append(list(shaperecord.shape.bbox))
+        polygons = get_polygons(shaperecord.shape.__geo_interface__)
+        for polygon in polygons:
+            for ring in polygon:
+                coords.append(asarray(ring, dtype=float64)[:, :2])
+                ring_offsets.append(ring_offsets[-1] + len(ring))
+            polygon_offsets.append(polygon_offsets[-1] + len(polygon))
+        region_offsets.append(region_offsets[-1] + len(polygons))
+
+    arrays = {"ids": array(ids, dtype=str),
+              "bboxes": array(bboxes, dtype=float64).reshape(-1, 4),
+              "region_offsets": array(region_offsets, dtype=int64),
+              "polygon_offsets": array(polygon_offsets, dtype=int64),
+              "ring_offsets": array(ring_offsets, dtype=int64),
+              "coords": concatenate(coords) if coords
+              else array([], dtype=float64).reshape(0, 2)}
+
+    makedirs(index_path, exist_ok=True)
+    for name in ARRAYS:
+        save(path.join(index_path, f"{name}.npy"), arrays[name])
+
+    return GeometryIndex(index_path)
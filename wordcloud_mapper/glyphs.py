@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from functools import lru_cache
+
+from numpy import asarray
+from PIL import Image, ImageDraw, ImageFont
+from wordcloud.wordcloud import FONT_PATH
+
+
+# maximum size of the cached glyphs in bytes
+CACHE_SIZE = 64 * 1024**2
+
+cache = OrderedDict()
+
+cache_bytes = 0
+
+
+@lru_cache(maxsize=256)
+def get_font(font_path,
+             font_size):
+    """
+    Load a font at a font size, reusing the fonts of earlier calls.
+
+    Parameters
+    ----------
+    font_path : str
+        Path to the font.
+    font_size : int
+        Font size in pixels.
+
+    Returns
+    -------
+    PIL.ImageFont.FreeTypeFont
+        The font.
+
+    """
+    return ImageFont.truetype(font_path, font_size)
+
+
+def get_glyph(word,
+              font_size,
+              rotated=False,
+              font_path=None):
+    """
+    Draw a word into a bitmap, exactly as it is drawn onto a wordcloud,
+    reusing the bitmaps of earlier calls. Bitmaps are cached in memory, keyed
+    by the font, the word, its font size and orientation, so words recurring
+    across regions and renders are only drawn once. The least recently used
+    bitmaps are dropped once they take up more than ``CACHE_SIZE`` bytes.
+
+    Parameters
+    ----------
+    word : str
+        The word.
+    font_size : int
+        Font size in pixels.
+    rotated : bool (default = False)
+        Whether the word is drawn vertically.
+    font_path : str or None (default = None)
+        Path to the font. If None, WordCloud's default font is used.
+
+    Returns
+    -------
+    ndarray
+        Read-only array of dtype uint8 holding the coverage of each pixel by
+        the word, whose top left corner is the position the word is drawn at.
+        Its shape is the size of the word's bounding box.
+
+    """
+    global cache_bytes
+
+    if font_path is None:
+        font_path = FONT_PATH
+    key = (font_path, word, font_size, rotated)
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+
+    font = ImageFont.TransposedFont(
+        get_font(font_path, font_size),
+        orientation=Image.ROTATE_90 if rotated else None)
+    left, top, right, bottom = ImageDraw.Draw(Image.new("L", (1, 1))) \
+        .textbbox((0, 0), word, font=font)
+    image = Image.new("L", (max(1, right), max(1, bottom)))
+    ImageDraw.Draw(image).text((0, 0), word, fill=255, font=font)
+    glyph = asarray(image)
+    glyph.flags.writeable = False
+
+    cache[key] = glyph
+    cache_bytes += glyph.nbytes
+    while cache_bytes > CACHE_SIZE and len(cache) > 1:
+        cache_bytes -= cache.popitem(last=False)[1].nbytes
+
+    return glyph
+
+
+def clear_cache():
+    """Drop all cached glyphs."""
+    global cache_bytes
+
+    cache.clear()
+    cache_bytes = 0
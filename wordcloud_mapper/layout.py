@@ -0,0 +1,239 @@
+from hashlib import sha256
+from json import dump, dumps, load
+from re import sub
+
+from matplotlib.font_manager import FontProperties
+from numpy import asarray
+from PIL import Image, ImageColor, ImageDraw
+from wordcloud.wordcloud import FONT_PATH
+
+from .glyphs import get_font, get_glyph
+
+
+def get_layout(wc):
+    """
+    Retrieve the layout of a generated wordcloud, i.e. where and how each
+    word is drawn, as plain data that can be saved as JSON.
+
+    Parameters
+    ----------
+    wc : wordcloud.WordCloud
+        Generated wordcloud.
+
+    Returns
+    -------
+    dict
+        Dictionary containing the ``"size"`` of the wordcloud's mask as
+        [width, height] in pixels and its ``"words"`` as a list of [word,
+        normalized frequency, font size, x, y, rotated, colour] lists, where
+        (x, y) is the top left corner of the word in mask pixels and rotated
+        is True for words drawn vertically.
+
+    """
+    height, width = wc.mask.shape[:2]
+    words = [[word, float(frequency), int(font_size), int(x), int(y),
+              orientation is not None, colour]
+             for (word, frequency), font_size, (y, x), orientation, colour
+             in wc.layout_]
+
+    return {"size": [width, height], "words": words}
+
+
+def get_data_digest(data):
+    """
+    Calculate the SHA-256 digest of a region's words and word counts, which
+    wordcloud_map() stores in the ``"data"`` entry of the region's layout.
+
+    Parameters
+    ----------
+    data : dict
+        Dictionary containing the words as keys and their count as values for
+        the region.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest.
+
+    """
+    return sha256(dumps([[str(word), float(count)]
+                         for word, count in data.items()])
+                  .encode("utf-8")).hexdigest()
+
+
+def matches_layout(layout,
+                   data):
+    """
+    Check whether a layout was made for a region's words and word counts,
+    i.e. whether its data digest (see ``get_data_digest()``) matches them.
+    Layouts without a digest never match.
+
+    Parameters
+    ----------
+    layout : dict
+        Layout of the wordcloud. See ``get_layout()``.
+    data : dict
+        Dictionary containing the words as keys and their count as values for
+        the region.
+
+    Returns
+    -------
+    bool
+        Whether the layout can be used for the data.
+
+    """
+    return layout.get("data") == get_data_digest(data)
+
+
+def render_layout(layout,
+                  scale=1.0,
+                  hue=None,
+                  font_path=None):
+    """
+    Draw a wordcloud from its layout, without searching for the words'
+    positions again. Allows drawing a wordcloud at any size or in other
+    colours.
+
+    Parameters
+    ----------
+    layout : dict
+        Layout of the wordcloud. See ``get_layout()``.
+    scale : float (default = 1.0)
+        Scale of the image relative to the wordcloud's mask.
+    hue : int or None (default = None)
+        Hue in the HSL colour system replacing the hue of all words. If None,
+        the words keep their colours.
+    font_path : str or None (default = None)
+        Path to the font used to draw the words. If None, WordCloud's default
+        font is used, which the layouts of wordcloud_map() are created with.
+
+    Returns
+    -------
+    ndarray
+        RGBA image array of the wordcloud.
+
+    """
+    if font_path is None:
+        font_path = FONT_PATH
+    width, height = layout["size"]
+
+    image = Image.new("RGBA", (int(width * scale), int(height * scale)))
+    draw = ImageDraw.Draw(image)
+    for word, _, font_size, x, y, rotated, colour in layout["words"]:
+        # the words' bitmaps are drawn like WordCloud.to_image() draws text,
+        # so this gives the same image as drawing the text directly
+        glyph = get_glyph(word, int(font_size * scale), rotated, font_path)
+        if hue is not None:
+            colour = sub(r"hsl\(\s*[\d.]+", f"hsl({hue}", colour)
+        draw.bitmap((int(x * scale), int(y * scale)), Image.fromarray(glyph),
+                    fill=colour)
+
+    return asarray(image)
+
+
+def plot_layout(layout,
+                ax,
+                bbox,
+                zorder=None,
+                font_path=None):
+    """
+    Draw a wordcloud from its layout as text on a matplotlib Axes, so that
+    the words stay vector graphics when the figure is saved, e.g. as SVG or
+    PDF file.
+
+    Parameters
+    ----------
+    layout : dict
+        Layout of the wordcloud. See ``get_layout()``.
+    ax : matplotlib.Axes class
+        An instance of the matplotlib Axes class to which the words are
+        plotted to.
+    bbox : tuple
+        Tuple containing (minX, maxX, minY, maxY) bounding box values of the
+        region, which the wordcloud's mask covers with the same aspect ratio
+        (see ``get_mask_size()``).
+    zorder : float or None (default = None)
+        Drawing order of the words. If None, matplotlib's default for text is
+        used.
+    font_path : str or None (default = None)
+        Path to the font used to draw the words. If None, WordCloud's default
+        font is used, which the layouts of wordcloud_map() are created with.
+
+    Returns
+    -------
+    list of matplotlib.text.Text
+        The words added to the Axes.
+
+    """
+    if font_path is None:
+        font_path = FONT_PATH
+    minX, maxX, minY, maxY = bbox
+    width, height = layout["size"]
+    unit_x, unit_y = (maxX - minX) / width, (maxY - minY) / height
+
+    # points per mask pixel, from the size the region takes up on the
+    # figure once its aspect ratio is applied. The mask has the aspect ratio
+    # of the region, so its longer side is the least affected by rounding
+    ax.apply_aspect()
+    (x0, y0), (x1, y1) = ax.transData.transform([(minX, minY), (maxX, maxY)])
+    scale = max(abs(x1 - x0), abs(y1 - y0)) / max(width, height)
+    points = scale * 72 / ax.figure.dpi
+
+    font_properties = FontProperties(fname=font_path)
+    texts = []
+    for word, _, font_size, x, y, rotated, colour in layout["words"]:
+        # WordCloud's words are drawn with the top of their ink at the
+        # layout's position, so anchor them at the start of their baseline
+        left, top, right, _ = get_font(font_path, font_size) \
+            .getbbox(word, anchor="ls")
+        if rotated:
+            x -= top
+            y += right
+        else:
+            y -= top
+        texts.append(ax.text(
+            minX + x * unit_x, maxY - y * unit_y, word,
+            color=tuple(value / 255 for value in ImageColor.getrgb(colour)),
+            fontproperties=font_properties, fontsize=font_size * points,
+            rotation=90 if rotated else 0, rotation_mode="anchor",
+            ha="left", va="baseline", zorder=zorder))
+
+    return texts
+
+
+def save_layouts(layouts,
+                 filepath):
+    """
+    Save the layouts of the regions of a wordcloud map as a JSON file.
+
+    Parameters
+    ----------
+    layouts : dict
+        Dictionary containing the NUTS codes of the regions as keys and their
+        layouts as values. See ``WordcloudMapRenderer.get_layouts()``.
+    filepath : str
+        Path to the JSON file.
+
+    """
+    with open(filepath, "w", encoding="utf-8") as file:
+        dump(layouts, file, separators=(",", ":"))
+
+
+def load_layouts(filepath):
+    """
+    Load the layouts of the regions of a wordcloud map from a JSON file.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the JSON file created with ``save_layouts()``.
+
+    Returns
+    -------
+    dict
+        Dictionary containing the NUTS codes of the regions as keys and their
+        layouts as values.
+
+    """
+    with open(filepath, encoding="utf-8") as file:
+        return load(file)
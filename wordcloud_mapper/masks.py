@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from hashlib import sha256
+from os import makedirs, path, replace
+from tempfile import NamedTemporaryFile
+
+from numpy import asarray, float64, int64, load, packbits, savez_compressed, \
+    uint8, unpackbits
+
+from .rasterize import rasterize_geometry
+
+
+CACHE_SIZE = 1024
+
+cache = OrderedDict()
+
+
+def get_geometry_hash(shape):
+    """
+    Calculate the SHA-256 digest of a shape's coordinates, which identifies
+    the geometry independently of the file or geometry index it was read from
+    and of whether it was simplified.
+
+    Parameters
+    ----------
+    shape : shapefile.Shape or IndexedShape
+        Polygon shape of a NUTS region.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest of the shape's points and parts.
+
+    """
+    digest = sha256()
+    digest.update(asarray(shape.points, dtype=float64)[:, :2].tobytes())
+    digest.update(asarray(shape.parts, dtype=int64).tobytes())
+
+    return digest.hexdigest()
+
+
+def pack(pixels):
+    """Pack a raster of 0 and 255 values into one bit per pixel."""
+    return packbits(pixels > 0, axis=None)
+
+
+def unpack(packed, width, height):
+    """Unpack a raster packed with ``pack()`` into 0 and 255 values."""
+    pixels = unpackbits(packed, count=width * height).reshape(height, width)
+    pixels *= uint8(255)
+    pixels.flags.writeable = False
+
+    return pixels
+
+
+def rasterize_shaperecord(shaperecord,
+                          width,
+                          height,
+                          fill=True,
+                          line_width=0,
+                          cache_dir=None):
+    """
+    Burn the shape of a region into an image, reusing the images of earlier
+    calls. Images are cached bit-packed in memory, keyed by the region's NUTS
+    code, its geometry hash and the image parameters, and additionally as
+    compressed files on disk if ``cache_dir`` is given.
+
+    Parameters
+    ----------
+    shaperecord : shapefile.ShapeRecord
+        ShapeRecord object of shapefile module containing information about a
+        single NUTS region.
+    width : int
+        Width of the image in pixels.
+    height : int
+        Height of the image in pixels.
+    fill : bool (default = True)
+        Whether to fill the region's interior.
+    line_width : int (default = 0)
+        Width in pixels of the region's border lines. If 0, no lines are
+        drawn.
+    cache_dir : str or None (default = None)
+        Path to the directory where images are cached on disk. If None, images
+        are only cached in memory.
+
+    Returns
+    -------
+    ndarray
+        Read-only array of shape (height, width) and dtype uint8, which is 255
+        where the region is drawn and 0 everywhere else.
+
+    """
+    key = (shaperecord.record.NUTS_ID, get_geometry_hash(shaperecord.shape),
+           width, height, fill, line_width)
+    if key in cache:
+        cache.move_to_end(key)
+        return unpack(cache[key], width, height)
+
+    filepath = None
+    if cache_dir is not None:
+        filename = sha256(repr(key).encode("utf-8")).hexdigest()
+        filepath = path.join(cache_dir, f"{filename}.npz")
+
+    if filepath is not None and path.exists(filepath):
+        with load(filepath) as archive:
+            packed = archive["pixels"]
+    else:
+        packed = pack(rasterize_geometry(
+            shaperecord.shape.__geo_interface__, tuple(shaperecord.shape.bbox),
+            width, height, fill=fill, line_width=line_width))
+        if filepath is not None:
+            # write to a temporary file first, so concurrent readers never see
+            # a partially written image
+            makedirs(cache_dir, exist_ok=True)
+            with NamedTemporaryFile(dir=cache_dir, suffix=".tmp",
+                                    delete=False) as file:
+                savez_compressed(file, pixels=packed)
+            replace(file.name, filepath)
+
+    cache[key] = packed
+    if len(cache) > CACHE_SIZE:
+        cache.popitem(last=False)
+
+    return unpack(packed, width, height)
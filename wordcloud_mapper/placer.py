@@ -0,0 +1,249 @@
+from random import Random
+
+from numpy import all as all_, flatnonzero, int32, uint8, zeros
+from PIL import Image
+from wordcloud.wordcloud import FONT_PATH
+
+from .glyphs import get_glyph
+
+
+def get_free_positions(integral,
+                       height,
+                       width,
+                       step=1):
+    """
+    Find all positions of a box that does not overlap any occupied pixel, in
+    a single pass over the integral image of the occupied pixels.
+
+    Parameters
+    ----------
+    integral : ndarray
+        Integral image of the occupied pixels, of shape (rows + 1, columns
+        + 1) with a leading row and column of zeros.
+    height : int
+        Height of the box in pixels.
+    width : int
+        Width of the box in pixels.
+    step : int (default = 1)
+        Distance in pixels between the positions checked, in both directions.
+
+    Returns
+    -------
+    tuple
+        Tuple containing the flat indices of the free top left corners on the
+        grid of checked positions and the number of columns of the grid.
+
+    """
+    rows, columns = integral.shape[0] - height, integral.shape[1] - width
+    if rows <= 0 or columns <= 0:
+        return flatnonzero([]), 0
+
+    # sum of the occupied pixels within the box at every position
+    occupied = integral[height::step, width::step] \
+        - integral[:rows:step, width::step] \
+        - integral[height::step, :columns:step] \
+        + integral[:rows:step, :columns:step]
+
+    return flatnonzero(occupied == 0), occupied.shape[1]
+
+
+def place_words(mask,
+                frequencies,
+                colour_func,
+                min_font_size=4,
+                max_font_size=None,
+                max_words=200,
+                relative_scaling=0.5,
+                prefer_horizontal=0.9,
+                repeat=False,
+                random_state=None,
+                margin=2,
+                font_path=None):
+    """
+    Place the words of a wordcloud within a mask with NumPy, as an
+    alternative to WordCloud's placement. Words are sized and oriented as
+    WordCloud does, but each candidate size is checked against all positions
+    at once on the integral image of the occupied pixels, the largest size
+    that still fits is found by bisection rather than one step at a time and
+    the words' bitmaps are shared with other regions (see ``get_glyph()``).
+
+    Parameters
+    ----------
+    mask : ndarray
+        The RGBA image array to use as mask of the wordcloud, where white
+        pixels are left empty.
+    frequencies : dict
+        Dictionary containing the words as keys and their count as values.
+    colour_func : callable
+        Function returning the colour of a word, called as WordCloud calls
+        its ``color_func``.
+    min_font_size : int (default = 4)
+        Smallest font size to use. Word placement will stop when there is no
+        more room to fit words of this size.
+    max_font_size : int or None (default = None)
+        Maximum font size for the largest word. If None, it is derived from
+        the sizes of the two most frequent words when placed alone, like
+        WordCloud does.
+    max_words : int (default = 200)
+        Maximum number of words to place.
+    relative_scaling : float (default = 0.5)
+        Importance of relative word frequencies for font-size. See
+        ``wordcloud_map()``.
+    prefer_horizontal : float (default = 0.9)
+        The ratio of times to try horizontal fitting as opposed to vertical.
+    repeat : bool (default = False)
+        Whether to repeat already-placed words until ``max_words`` or
+        ``min_font_size`` is reached.
+    random_state : int, random.Random or None (default = None)
+        Seed or random number generator used to place and colour the words.
+    margin : int (default = 2)
+        Space in pixels kept around each word.
+    font_path : str or None (default = None)
+        Path to the font used to draw the words. If None, WordCloud's default
+        font is used.
+
+    Returns
+    -------
+    dict
+        Layout of the wordcloud. See ``get_layout()``.
+
+    Raises
+    ------
+    ValueError
+        If there are no words or no space to place any of them.
+
+    """
+    if font_path is None:
+        font_path = FONT_PATH
+    if not isinstance(random_state, Random):
+        random_state = Random(random_state)
+
+    frequencies = sorted(frequencies.items(), key=lambda item: item[1],
+                         reverse=True)[:max_words]
+    if not frequencies:
+        raise ValueError("We need at least 1 word to plot a word cloud.")
+    max_frequency = float(frequencies[0][1])
+    frequencies = [(word, count / max_frequency)
+                   for word, count in frequencies]
+
+    height, width = mask.shape[:2]
+    if max_font_size is None:
+        # WordCloud is set up with at most 200 pixels as initial font size
+        font_size = min(200, height)
+        if len(frequencies) > 1:
+            sizes = [font_size for _, _, font_size, *_ in place_words(
+                mask, dict(frequencies[:2]), colour_func,
+                min_font_size=min_font_size, max_font_size=font_size,
+                relative_scaling=relative_scaling,
+                prefer_horizontal=prefer_horizontal,
+                random_state=random_state, margin=margin,
+                font_path=font_path)["words"]]
+            if not sizes:
+                raise ValueError("Couldn't find space to draw.")
+            font_size = int(2 * sizes[0] * sizes[1] / (sizes[0] + sizes[1])) \
+                if len(sizes) > 1 else sizes[0]
+    else:
+        font_size = max_font_size
+
+    if repeat and len(frequencies) < max_words:
+        # pad frequencies with repeating words, downweighted each time
+        times_extend = -(-max_words // len(frequencies)) - 1
+        original, downweight = list(frequencies), frequencies[-1][1]
+        for i in range(times_extend):
+            frequencies.extend([(word, frequency * downweight ** (i + 1))
+                                for word, frequency in original])
+
+    if mask.ndim == 3:
+        occupied = all_(mask[:, :, :3] == 255, axis=-1).astype(uint8)
+    else:
+        occupied = (mask == 255).astype(uint8)
+    integral = zeros((height + 1, width + 1), dtype=int32)
+    integral[1:, 1:] = occupied.cumsum(0).cumsum(1)
+
+    def get_position(font_size, rotated):
+        """Pick a random free position of the word, or None."""
+        glyph_height, glyph_width = get_glyph(word, font_size, rotated,
+                                              font_path).shape
+        box_height, box_width = glyph_height + margin, glyph_width + margin
+
+        # no need to search if there are not enough free pixels left
+        if box_height * box_width > free_pixels:
+            return None
+
+        # search a coarse grid of positions first, which finds a place for
+        # most words, and all positions only if there is none on the grid
+        step = max(1, min(box_height, box_width) // 2)
+        free, columns = get_free_positions(integral, box_height, box_width,
+                                           step)
+        if not free.size and step > 1:
+            step = 1
+            free, columns = get_free_positions(integral, box_height,
+                                               box_width)
+        if not free.size:
+            return None
+        row, column = divmod(int(free[random_state.randrange(free.size)]),
+                             columns)
+        return row * step + margin // 2, column * step + margin // 2
+
+    free_pixels = int(occupied.size - occupied.sum())
+    words = []
+    last_frequency = 1.
+    for word, frequency in frequencies:
+        if frequency == 0:
+            continue
+        if relative_scaling != 0:
+            font_size = int(round((relative_scaling
+                                   * (frequency / last_frequency)
+                                   + (1 - relative_scaling)) * font_size))
+        rotated = random_state.random() >= prefer_horizontal
+
+        position = None
+        if font_size >= min_font_size:
+            position = get_position(font_size, rotated)
+            if position is None and prefer_horizontal < 1:
+                rotated = not rotated
+                position = get_position(font_size, rotated)
+        if position is None:
+            # find the largest smaller size that fits horizontally, assuming
+            # that a word fits wherever it fits at a larger size
+            rotated = False
+            low, high = min_font_size, font_size - 1
+            if high < low or get_position(low, rotated) is None:
+                # no room for any more words
+                break
+            while low < high:
+                middle = (low + high + 1) // 2
+                if get_position(middle, rotated) is None:
+                    high = middle - 1
+                else:
+                    low = middle
+            font_size = low
+            position = get_position(font_size, rotated)
+
+        row, column = position
+        glyph = get_glyph(word, font_size, rotated, font_path) > 0
+        covered = occupied[row:row + glyph.shape[0],
+                           column:column + glyph.shape[1]]
+        added = glyph[:covered.shape[0], :covered.shape[1]] & (covered == 0)
+        covered |= added
+        free_pixels -= int(added.sum())
+
+        # add the word's pixels to the integral image, which only changes
+        # below and to the right of the word
+        added = added.astype(int32).cumsum(0).cumsum(1)
+        bottom, right = row + added.shape[0] + 1, column + added.shape[1] + 1
+        integral[row + 1:bottom, column + 1:right] += added
+        integral[bottom:, column + 1:right] += added[-1]
+        integral[row + 1:bottom, right:] += added[:, -1:]
+        integral[bottom:, right:] += added[-1, -1]
+
+        words.append([word, frequency, font_size, column, row, rotated,
+                      colour_func(word, font_size=font_size,
+                                  position=(row, column),
+                                  orientation=Image.ROTATE_90 if rotated
+                                  else None,
+                                  random_state=random_state,
+                                  font_path=font_path)])
+        last_frequency = frequency
+
+    return {"size": [width, height], "words": words}
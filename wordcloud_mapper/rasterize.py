@@ -0,0 +1,88 @@
+from numpy import asarray, float64, uint8
+from PIL import Image, ImageDraw
+
+from .geometry_index import get_polygons
+
+
+def to_pixels(ring, bbox, width, height):
+    """
+    Convert the coordinates of a ring to pixel coordinates of an image
+    spanning the given bounding box.
+
+    Parameters
+    ----------
+    ring : sequence
+        Points of the ring, one (x, y) pair per point.
+    bbox : tuple
+        Tuple containing (minX, minY, maxX, maxY) bounding box values mapped
+        to the image's edges.
+    width : int
+        Width of the image in pixels.
+    height : int
+        Height of the image in pixels.
+
+    Returns
+    -------
+    list of float
+        Flat list of alternating x and y pixel coordinates.
+
+    """
+    minX, minY, maxX, maxY = bbox
+    points = asarray(ring, dtype=float64)[:, :2]
+    pixels = (points - (minX, maxY)) \
+        * (width / max(maxX - minX, 1e-12), -height / max(maxY - minY, 1e-12))
+
+    # pixel coordinates refer to the centre of each pixel
+    return (pixels - 0.5).ravel().tolist()
+
+
+def rasterize_geometry(geometry,
+                       bbox,
+                       width,
+                       height,
+                       fill=True,
+                       line_width=0):
+    """
+    Burn a Polygon or MultiPolygon geometry into an image, holes included.
+
+    Parameters
+    ----------
+    geometry : dict
+        GeoJSON-like dictionary, e.g. the ``__geo_interface__`` of a shape.
+    bbox : tuple
+        Tuple containing (minX, minY, maxX, maxY) bounding box values mapped
+        to the image's edges.
+    width : int
+        Width of the image in pixels.
+    height : int
+        Height of the image in pixels.
+    fill : bool (default = True)
+        Whether to fill the polygons' interiors.
+    line_width : int (default = 0)
+        Width in pixels of the lines drawn along the polygons' rings. If 0, no
+        lines are drawn.
+
+    Returns
+    -------
+    ndarray
+        Array of shape (height, width) and dtype uint8, which is 255 where the
+        geometry is drawn and 0 everywhere else.
+
+    """
+    image = Image.new("L", (width, height), 0)
+    draw = ImageDraw.Draw(image)
+    polygons = [[to_pixels(ring, bbox, width, height) for ring in polygon]
+                for polygon in get_polygons(geometry)]
+
+    if fill:
+        for exterior, *holes in polygons:
+            draw.polygon(exterior, fill=255)
+            for hole in holes:
+                draw.polygon(hole, fill=0)
+
+    if line_width > 0:
+        for polygon in polygons:
+            for ring in polygon:
+                draw.line(ring, fill=255, width=line_width, joint="curve")
+
+    return asarray(image, dtype=uint8)
@@ -0,0 +1,137 @@
+from hashlib import sha256
+from json import dumps, loads
+from os import makedirs, path, replace, utime
+from tempfile import NamedTemporaryFile
+
+from numpy import load, savez_compressed, uint8, zeros
+from wordcloud import __version__ as wordcloud_version
+
+from .cache import evict, read_index, write_index
+
+
+# bumped whenever the wordclouds generated from the same inputs change
+FORMAT_VERSION = 2
+
+
+def get_result_key(mask,
+                   data,
+                   hue,
+                   random_state,
+                   **kwargs):
+    """
+    Calculate the key of a region's wordcloud in the result cache, i.e. the
+    SHA-256 digest of everything the wordcloud is generated from.
+
+    Parameters
+    ----------
+    mask : ndarray
+        The image array used as mask of the wordcloud, which identifies the
+        region's shape and size.
+    data : dict
+        Dictionary containing the words as keys and their count as values for
+        the region.
+    hue : int
+        Hue in the HSL colour system of the region.
+    random_state : int
+        Seed of the random number generator of the region.
+
+    Other Parameters
+    ----------------
+    **kwargs
+        Keyword arguments passed to ``generate_region()``.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest.
+
+    """
+    inputs = {"data": [[str(word), float(count)]
+                       for word, count in data.items()],
+              "hue": hue,
+              "random_state": random_state,
+              "options": kwargs,
+              "versions": [FORMAT_VERSION, wordcloud_version]}
+
+    # functions, e.g. a custom layout engine, are identified by their name
+    digest = sha256(dumps(inputs, sort_keys=True,
+                          default=lambda value: f"{value.__module__}."
+                          f"{value.__qualname__}").encode("utf-8"))
+    digest.update(repr(mask.shape).encode("utf-8"))
+    digest.update(mask.tobytes())
+
+    return digest.hexdigest()
+
+
+def load_result(cache_dir,
+                key):
+    """
+    Load a region's wordcloud from the result cache.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Path to the result cache directory.
+    key : str
+        Key of the wordcloud. See ``get_result_key()``.
+
+    Returns
+    -------
+    tuple or None
+        Tuple containing the RGBA image array and the layout of the wordcloud
+        (both None if the region had no wordcloud), or None if the wordcloud
+        is not cached.
+
+    """
+    filepath = path.join(cache_dir, f"{key}.npz")
+    try:
+        with load(filepath) as archive:
+            img_array = archive["img_array"]
+            layout = loads(str(archive["layout"]))
+    except (OSError, ValueError, KeyError):
+        return None
+
+    # mark as recently used
+    utime(filepath)
+
+    return (img_array if img_array.size else None), layout
+
+
+def store_results(cache_dir,
+                  results,
+                  max_cache_size):
+    """
+    Store wordclouds in the result cache, deleting the least recently used
+    ones if the cache grows larger than ``max_cache_size``.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Path to the result cache directory.
+    results : dict
+        Dictionary containing the keys of the wordclouds as keys and tuples
+        of their RGBA image array and layout (or None) as values.
+    max_cache_size : int or None
+        Maximum size of the result cache in bytes. If None, the cache is
+        unbounded.
+
+    """
+    if not results:
+        return
+
+    makedirs(cache_dir, exist_ok=True)
+    index = read_index(cache_dir)
+    for key, (img_array, layout) in results.items():
+        if img_array is None:
+            img_array = zeros((0, 0, 4), dtype=uint8)
+        with NamedTemporaryFile(dir=cache_dir, suffix=".tmp",
+                                delete=False) as file:
+            savez_compressed(file, img_array=img_array,
+                             layout=dumps(layout))
+        filename = f"{key}.npz"
+        replace(file.name, path.join(cache_dir, filename))
+        index[key] = {"file": filename,
+                      "size": path.getsize(path.join(cache_dir, filename))}
+
+    evict(cache_dir, index, max_cache_size, keep=results)
+    write_index(cache_dir, index)
@@ -0,0 +1,136 @@
+from collections import OrderedDict
+
+from numpy import argmax, asarray, float64, hypot, zeros
+
+from .geometry_index import (IndexedRecord, IndexedShape, IndexedShapeRecord,
+                             get_polygons)
+
+
+CACHE_SIZE = 4096
+
+cache = OrderedDict()
+
+
+def get_tolerance(pixels_per_unit,
+                  pixel_fraction=0.5):
+    """
+    Retrieve the simplification tolerance matching a given output resolution,
+    i.e. the largest deviation from the original geometry that stays below a
+    fraction of a pixel.
+
+    Parameters
+    ----------
+    pixels_per_unit : float or tuple
+        Number of pixels per unit of the coordinate system. A tuple gives
+        different values for the X and Y axes, of which the finest is used.
+    pixel_fraction : float (default = 0.5)
+        Largest deviation allowed, as a fraction of a pixel.
+
+    Returns
+    -------
+    float
+        Tolerance in units of the coordinate system.
+
+    """
+    if isinstance(pixels_per_unit, (int, float)):
+        pixels_per_unit = (pixels_per_unit,)
+
+    return pixel_fraction / max(pixels_per_unit)
+
+
+def simplify_ring(ring,
+                  tolerance):
+    """
+    Simplify a ring with the Douglas-Peucker algorithm. Rings that would
+    collapse to less than a triangle are returned unchanged, so no region or
+    hole ever disappears.
+
+    Parameters
+    ----------
+    ring : sequence
+        Points of the ring, one (x, y) pair per point, with the first point
+        repeated at the end.
+    tolerance : float
+        Largest distance between the original and the simplified ring, in
+        units of the coordinate system.
+
+    Returns
+    -------
+    ndarray
+        Points of the simplified ring, one (x, y) row per point.
+
+    """
+    points = asarray(ring, dtype=float64)[:, :2]
+    if len(points) <= 4 or tolerance <= 0:
+        return points
+
+    keep = zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, stop = stack.pop()
+        if stop - start < 2:
+            continue
+
+        # distance of the points in between to the line from start to stop
+        first, (dx, dy) = points[start], points[stop] - points[start]
+        between = points[start + 1:stop] - first
+        length = hypot(dx, dy)
+        if length == 0:
+            distances = hypot(between[:, 0], between[:, 1])
+        else:
+            distances = abs(dx * between[:, 1] - dy * between[:, 0]) / length
+
+        farthest = argmax(distances)
+        if distances[farthest] > tolerance:
+            farthest += start + 1
+            keep[farthest] = True
+            stack.append((start, farthest))
+            stack.append((farthest, stop))
+
+    if keep.sum() < 4:
+        return points
+
+    return points[keep]
+
+
+def simplify_shaperecord(shaperecord,
+                         tolerance):
+    """
+    Simplify the shape of a region, ring by ring. Results are cached per
+    region and tolerance, so each shape is only simplified once per process.
+
+    Parameters
+    ----------
+    shaperecord : shapefile.ShapeRecord
+        ShapeRecord object of shapefile module containing information about a
+        single NUTS region.
+    tolerance : float
+        Largest distance between the original and the simplified shape, in
+        units of the coordinate system. See ``get_tolerance()``.
+
+    Returns
+    -------
+    IndexedShapeRecord
+        Shape and record of the region with the simplified shape and the
+        original bounding box.
+
+    """
+    bbox = tuple(float(value) for value in shaperecord.shape.bbox)
+    key = (shaperecord.record.NUTS_ID, bbox, len(shaperecord.shape.points),
+           tolerance)
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+
+    geometry = shaperecord.shape.__geo_interface__
+    polygons = [[simplify_ring(ring, tolerance) for ring in polygon]
+                for polygon in get_polygons(geometry)]
+    simplified = IndexedShapeRecord(IndexedShape(polygons, bbox),
+                                    IndexedRecord(shaperecord.record.NUTS_ID))
+
+    cache[key] = simplified
+    if len(cache) > CACHE_SIZE:
+        cache.popitem(last=False)
+
+    return simplified
@@ -0,0 +1,110 @@
+from contextlib import contextmanager
+from time import perf_counter
+
+
+class RenderStats:
+    """
+    Statistics about rendering a wordcloud map, filled in by
+    ``WordcloudMapRenderer.render()`` and returned by ``wordcloud_map()`` if
+    ``return_stats = True``.
+
+    Parameters
+    ----------
+    callback : callable or None (default = None)
+        Function called with a dictionary describing each recorded event, i.e.
+        containing the ``"stage"``, its ``"duration"`` in seconds, the
+        ``"nuts_id"`` of the region for per-region events (None otherwise) and
+        any values recorded with the event. Allows logging the progress of
+        long renders as it happens.
+
+    Attributes
+    ----------
+    stages : dict
+        Dictionary containing the names of the stages as keys and their total
+        duration in seconds as values, in the order they first ran.
+    regions : dict
+        Dictionary containing the NUTS codes of the regions as keys and
+        dictionaries of the values recorded for each region as values, e.g.
+        ``"mask"`` and ``"wordcloud"`` durations, ``"mask_pixels"``,
+        ``"words_requested"`` and ``"words_placed"``.
+    peak_memory : int or None
+        Peak memory allocated by Python during rendering in bytes, if traced.
+        Memory allocated by worker processes is not included.
+    width : int or None
+        Width of the figure in pixels.
+    height : int or None
+        Height of the figure in pixels.
+
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.stages = {}
+        self.regions = {}
+        self.peak_memory = None
+        self.width = None
+        self.height = None
+
+    def __str__(self):
+        message = f"Figure successfully produced with width {self.width}px \
+and height {self.height}px."
+        stages = ", ".join(f"{stage} {duration:.2f}s"
+                           for stage, duration in self.stages.items())
+        if stages:
+            message += f" Time taken: {stages}."
+        if self.peak_memory is not None:
+            message += f" Peak memory: {self.peak_memory / 1024**2:.1f} MB."
+
+        return message
+
+    def record(self,
+               stage,
+               duration,
+               nuts_id=None,
+               **values):
+        """
+        Record the duration of a stage, for the whole map or for one region.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage, e.g. ``"masks"``.
+        duration : float
+            Duration of the stage in seconds.
+        nuts_id : str or None (default = None)
+            NUTS code of the region the stage ran for. If None, the stage ran
+            for the whole map.
+
+        Other Parameters
+        ----------------
+        **values
+            Other values to record, e.g. ``words_placed=50``.
+
+        """
+        if nuts_id is None:
+            self.stages[stage] = self.stages.get(stage, 0) + duration
+        else:
+            self.regions.setdefault(nuts_id, {}).update(
+                {stage: duration}, **values)
+
+        if self.callback is not None:
+            self.callback({"stage": stage, "duration": duration,
+                           "nuts_id": nuts_id, **values})
+
+    @contextmanager
+    def stage(self, stage):
+        """
+        Record the duration of a stage of the whole map, i.e. of the code
+        within the ``with`` block.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage, e.g. ``"masks"``.
+
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, perf_counter() - start)
@@ -0,0 +1,195 @@
+from numpy import arange, asarray, concatenate, flatnonzero, float64, \
+    int64, lexsort, minimum, unique
+
+
+def import_pyarrow():
+    """Import pyarrow, which is only needed for Arrow and Parquet input."""
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError(
+            "Reading Arrow tables and Parquet files requires pyarrow, which "
+            "can be installed with `pip install wordcloud_mapper[arrow]`."
+        ) from error
+
+    return pyarrow
+
+
+def is_arrow_table(data):
+    """
+    Check whether data is a pyarrow Table, without importing pyarrow.
+
+    Parameters
+    ----------
+    data : object
+        The data, e.g. a DataFrame.
+
+    Returns
+    -------
+    bool
+        Whether the data is a pyarrow Table.
+
+    """
+    return type(data).__module__.startswith("pyarrow") \
+        and type(data).__name__ == "Table"
+
+
+def read_parquet_table(filepath,
+                       columns,
+                       nuts_codes=None,
+                       regions=None):
+    """
+    Read the columns of a Parquet file or dataset needed for a map into a
+    pyarrow Table. Only the given columns are read and, if ``regions`` is
+    given, the row groups and rows of other regions are skipped while
+    reading.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the Parquet file or to a directory of Parquet files.
+    columns : list of str
+        Names of the columns to read.
+    nuts_codes : str or None (default = None)
+        Name of the column containing the NUTS codes. Required if
+        ``regions`` is given.
+    regions : list of str or None (default = None)
+        NUTS codes of the regions whose rows are read. If None, all rows are
+        read.
+
+    Returns
+    -------
+    pyarrow.Table
+        Table containing the given columns.
+
+    """
+    pyarrow = import_pyarrow()
+    filters = None
+    if regions is not None:
+        filters = [(nuts_codes, "in", list(regions))]
+
+    return pyarrow.parquet.read_table(filepath, columns=list(columns),
+                                      filters=filters)
+
+
+def filter_regions(df,
+                   nuts_codes,
+                   regions):
+    """
+    Select the rows of the given regions from a DataFrame or pyarrow Table.
+
+    Parameters
+    ----------
+    df : DataFrame or pyarrow.Table
+        Data containing a column with NUTS codes.
+    nuts_codes : str
+        Name of the column containing the NUTS codes.
+    regions : list of str
+        NUTS codes of the regions to select.
+
+    Returns
+    -------
+    DataFrame or pyarrow.Table
+        The rows of the given regions.
+
+    """
+    if is_arrow_table(df):
+        pyarrow = import_pyarrow()
+        return df.filter(pyarrow.compute.is_in(
+            df[nuts_codes], value_set=pyarrow.array(list(regions))))
+
+    return df.loc[df[nuts_codes].isin(list(regions))]
+
+
+def get_unique_codes_arrow(table,
+                           nuts_codes):
+    """
+    Retrieve all unique NUTS codes in a pyarrow Table. See
+    ``get_unique_codes()``.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+        Table containing a column with NUTS codes.
+    nuts_codes : str
+        Name of the column in the Table containing the NUTS codes.
+
+    Returns
+    -------
+    ndarray
+        Sorted array containing unique NUTS codes.
+
+    """
+    pyarrow = import_pyarrow()
+    codes = pyarrow.compute.unique(table[nuts_codes]).drop_null()
+
+    return unique(codes.to_numpy(zero_copy_only=False))
+
+
+def get_data_by_region_arrow(table,
+                             nuts_codes,
+                             words,
+                             word_counts,
+                             max_words):
+    """
+    Retrieve the words and their count/frequency for all NUTS codes of a
+    pyarrow Table. Rows are sorted by the dictionary-encoded NUTS codes and
+    the word counts, without sorting or converting the words, and only the
+    top words of each region are converted to Python objects. See
+    ``get_data_by_region()``.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+        Table containing columns with NUTS codes, words and word counts.
+    nuts_codes : str
+        Name of the column in the Table containing the NUTS codes.
+    words : str
+        Name of the column in the Table containing the words.
+    word_counts : str
+        Name of the column in the Table containing the word counts.
+    max_words : int
+        The number of words to plot on each wordcloud.
+
+    Returns
+    -------
+    dict
+        Dictionary containing the NUTS codes as keys and, as values,
+        dictionaries containing the words as keys and their count as values
+        for the given NUTS region.
+
+    """
+    pyarrow = import_pyarrow()
+    table = table.select([nuts_codes, words, word_counts])
+    table = table.filter(pyarrow.compute.and_(
+        pyarrow.compute.is_valid(table[nuts_codes]),
+        pyarrow.compute.is_valid(table[words])))
+    if not table.num_rows:
+        return {}
+
+    encoded = pyarrow.compute.dictionary_encode(
+        table[nuts_codes].combine_chunks())
+    codes = asarray(encoded.indices)
+    counts = table[word_counts].to_numpy().astype(float64)
+
+    # sort by region and count, then split the order at the boundaries
+    # between regions and keep the top words of each region
+    order = lexsort((-counts, codes))
+    sorted_codes = codes[order]
+    starts = concatenate([[0], flatnonzero(sorted_codes[1:]
+                                           != sorted_codes[:-1]) + 1])
+    stops = minimum(concatenate([starts[1:], [len(order)]]),
+                    starts + max_words)
+    top = order[concatenate([arange(start, stop, dtype=int64)
+                             for start, stop in zip(starts, stops)])]
+
+    region_words = table[words].take(top).to_pylist()
+    region_counts = table[word_counts].take(top).to_pylist()
+    names = encoded.dictionary.to_pylist()
+    bounds = concatenate([[0], (stops - starts).cumsum()])
+
+    return {names[sorted_codes[start]]: dict(zip(region_words[first:last],
+                                                 region_counts[first:last]))
+            for start, first, last in zip(starts, bounds[:-1], bounds[1:])}
@@ -1,17 +1,48 @@
 from shapefile import Reader
-from numpy import unique, frombuffer, reshape, fromiter, uint8
+from numpy import unique, flatnonzero, zeros, uint8, float32
 import matplotlib.pyplot as plt
-from descartes import PolygonPatch
-from io import BytesIO
+from matplotlib import rcParams
+from matplotlib.colors import to_rgb
+from matplotlib.collections import LineCollection
 from wordcloud import WordCloud
-from random import randint
+from random import Random, randint
+from hashlib import sha256
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from os import PathLike, cpu_count, path
+from io import BytesIO
+from time import perf_counter
+import tracemalloc
+from .cache import (fetch_shapefiles, get_cache_dir, get_shapefiles_name,
+                    GISCO_URL, DEFAULT_MAX_CACHE_SIZE)
+from .geometry_index import GeometryIndex, get_rings
+from .masks import rasterize_shaperecord
+from .composite import composite, get_pixel_box, resize_tile
+from .stats import RenderStats
+from .results import get_result_key, load_result, store_results
+from .layout import (get_data_digest, get_layout, load_layouts,
+                     matches_layout, plot_layout, render_layout,
+                     save_layouts)
+from .placer import place_words
+from .colours import get_colour_table
+from .tables import (filter_regions, get_data_by_region_arrow,
+                     get_unique_codes_arrow, is_arrow_table,
+                     read_parquet_table)
+from .simplify import get_tolerance, simplify_shaperecord
 
 
 def download_shapefiles(shapes_scale="10M",
                         nuts_year=2021,
-                        coord_system=4326):
+                        coord_system=4326,
+                        cache=True,
+                        cache_dir=None,
+                        max_cache_size=DEFAULT_MAX_CACHE_SIZE,
+                        offline=False):
     """
     Download shapefiles for NUTS regions from Eurostat's GISCO database.
+    Downloaded shapefiles are cached locally, so they are only downloaded once
+    for each combination of ``shapes_scale``, ``nuts_year`` and
+    ``coord_system``.
 
     Parameters
     ----------
@@ -31,6 +62,21 @@ def download_shapefiles(shapes_scale="10M",
         degrees), ``3035`` (ETRS 1989 in Lambert Azimutal projection with
         centre in E52N10, coordinates in meters), ``3857`` (WGS84 Web Mercator
         Auxiliary Sphere, coordinates in meters).
+    cache : bool (default = True)
+        Whether to cache the downloaded shapefiles locally. If False, the
+        shapefiles are downloaded every time.
+    cache_dir : str or None (default = None)
+        Path to the directory where shapefiles are cached. If None, the path
+        given by the ``WORDCLOUD_MAPPER_CACHE`` environment variable is used
+        or, if that is not set, ``~/.cache/wordcloud_mapper``.
+    max_cache_size : int or None (default = 1 GB)
+        Maximum size of the cache in bytes. The least recently used shapefiles
+        are deleted when it is exceeded. If None, the cache is unbounded.
+    offline : bool (default = False)
+        If True, never download shapefiles and only use the ones cached in
+        ``cache_dir``. Shapefiles downloaded from GISCO (e.g.
+        ``NUTS_RG_10M_2021_4326.shp.zip``) can be placed in the ``shapefiles``
+        subdirectory of ``cache_dir`` to use them without internet access.
 
     Returns
     -------
@@ -39,9 +85,15 @@ def download_shapefiles(shapes_scale="10M",
         regions.
 
     """
-    url = f"https://gisco-services.ec.europa.eu/distribution/v2/nuts/shp/\
-NUTS_RG_{shapes_scale}_{nuts_year}_{coord_system}.shp.zip"
-    shapefiles = Reader(url)
+    if cache or offline:
+        filepath = fetch_shapefiles(shapes_scale, nuts_year, coord_system,
+                                    cache_dir=cache_dir,
+                                    max_cache_size=max_cache_size,
+                                    offline=offline)
+        shapefiles = Reader(filepath)
+    else:
+        name = get_shapefiles_name(shapes_scale, nuts_year, coord_system)
+        shapefiles = Reader(GISCO_URL.format(name=name))
 
     return shapefiles
 
@@ -53,7 +105,7 @@ def get_unique_codes(df,
 
     Parameters
     ----------
-    df : DataFrame
+    df : DataFrame or pyarrow.Table
         DataFrame containing a column with NUTS codes.
     nuts_codes : str
         Name of the column in the DataFrame containing the NUTS codes.
@@ -64,25 +116,57 @@ def get_unique_codes(df,
         Array containing unique NUTS codes.
 
     """
+    if is_arrow_table(df):
+        return get_unique_codes_arrow(df, nuts_codes)
+
     unique_codes, counts = unique(df[nuts_codes].values, return_counts=True)
 
     return unique_codes
 
 
-def get_bbox_map(shapefiles,
-                 unique_codes):
+def get_shaperecords(shapefiles,
+                     unique_codes):
     """
-    Retreive the minimum and maximum X and Y bounding box values from all
-    shapefiles to use as boundaries for the final wordcloud map.
+    Retrieve the shapes and records of the regions in the provided dataset.
+    Only the records of the shapefiles are scanned for the given NUTS codes,
+    so the shapes of all other regions are never parsed.
 
     Parameters
     ----------
-    shapefiles : shapefile.Reader
+    shapefiles : shapefile.Reader or GeometryIndex
         Reader object of shapefile module containing shapefiles of NUTS
-        regions.
+        regions or geometry index of NUTS regions.
     unique_codes : ndarray
         Array containing unique NUTS codes.
 
+    Returns
+    -------
+    list of shapefile.ShapeRecord
+        ShapeRecord objects of the regions, in the order in which they are
+        stored in the shapefiles.
+
+    """
+    codes = set(unique_codes)
+
+    if isinstance(shapefiles, GeometryIndex):
+        return shapefiles.shapeRecords(codes)
+
+    return [shapefiles.shapeRecord(i)
+            for i, record in enumerate(shapefiles.iterRecords(
+                fields=["NUTS_ID"]))
+            if record.NUTS_ID in codes]
+
+
+def get_bbox_map(shaperecords):
+    """
+    Retreive the minimum and maximum X and Y bounding box values from all
+    shapefiles to use as boundaries for the final wordcloud map.
+
+    Parameters
+    ----------
+    shaperecords : list of shapefile.ShapeRecord
+        ShapeRecord objects of the regions plotted on the map.
+
     Returns
     -------
     Xmin : float
@@ -101,14 +185,12 @@ def get_bbox_map(shapefiles,
     Xmaxs = []
     Ymaxs = []
 
-    for i, shaperecord in enumerate(shapefiles.shapeRecords()):
-        nuts_id = shaperecord.record.NUTS_ID
-        if nuts_id in unique_codes:
-            minX, minY, maxX, maxY = shaperecord.shape.bbox
-            Xmins.append(minX)
-            Ymins.append(minY)
-            Xmaxs.append(maxX)
-            Ymaxs.append(maxY)
+    for shaperecord in shaperecords:
+        minX, minY, maxX, maxY = shaperecord.shape.bbox
+        Xmins.append(minX)
+        Ymins.append(minY)
+        Xmaxs.append(maxX)
+        Ymaxs.append(maxY)
 
     # select only min and max values from lists
     Xmin, Ymin, Xmax, Ymax = min(Xmins), min(Ymins), max(Xmaxs), max(Ymaxs)
@@ -144,13 +226,76 @@ def get_bbox_region(shaperecord):
     return minX, maxX, minY, maxY
 
 
+def get_pixels_per_unit(ax):
+    """
+    Retrieve the number of pixels that one unit of the coordinate system takes
+    up along the X and Y axes of the final wordcloud map, i.e. within the
+    Axes once its aspect ratio is applied. With matplotlib's default equal
+    aspect ratio, both values are the same.
+
+    Parameters
+    ----------
+    ax : matplotlib.Axes class
+        An instance of the matplotlib Axes class the map is plotted to, with
+        its limits set to the bounding box of the map.
+
+    Returns
+    -------
+    tuple
+        Tuple containing the number of pixels per unit along the X and Y
+        axes.
+
+    """
+    ax.apply_aspect()
+    extent = ax.get_window_extent()
+    (Xmin, Xmax), (Ymin, Ymax) = ax.get_xlim(), ax.get_ylim()
+
+    return extent.width / (Xmax - Xmin), extent.height / (Ymax - Ymin)
+
+
+def get_mask_size(shaperecord,
+                  pixels_per_unit):
+    """
+    Retrieve the size in pixels of a region's mask, so that the mask has the
+    same aspect ratio and the same number of pixels as the region on the
+    final wordcloud map.
+
+    Parameters
+    ----------
+    shaperecord : shapefile.ShapeRecord
+        ShapeRecord object of shapefile module containing information about a
+        single NUTS region.
+    pixels_per_unit : float or tuple
+        Number of pixels per unit of the coordinate system. A tuple sets
+        different values for the X and Y axes.
+
+    Returns
+    -------
+    tuple
+        Tuple containing the width and height of the mask in pixels.
+
+    """
+    minX, maxX, minY, maxY = get_bbox_region(shaperecord)
+    if isinstance(pixels_per_unit, (int, float)):
+        pixels_per_unit = (pixels_per_unit, pixels_per_unit)
+    ppu_x, ppu_y = pixels_per_unit
+
+    return max(1, round((maxX - minX) * ppu_x)), \
+        max(1, round((maxY - minY) * ppu_y))
+
+
 def get_mask(shaperecord,
              fill_colour="black",
              contour_colour="black",
-             resolution=100):
+             resolution=100,
+             size=None,
+             cache_dir=None):
     """
     Create images to be used as mask (i.e. the shape) of the wordcloud and to
-    add border lines to the final wordcloud map.
+    add border lines to the final wordcloud map. The region is burnt directly
+    into an RGBA array the size of matplotlib's default figure at the given
+    DPI or of the given size, leaving a transparent white background outside
+    of it.
 
     Parameters
     ----------
@@ -166,6 +311,13 @@ def get_mask(shaperecord,
     resolution : str (default = 100)
         DPI (dots per inch) value used to generate mask image. Higher values
         create sharper regional border lines but take longer to run.
+    size : tuple or None (default = None)
+        Tuple containing the width and height of the mask image in pixels. If
+        None, the size of matplotlib's default figure at ``resolution`` DPI is
+        used. See ``get_mask_size()``.
+    cache_dir : str or None (default = None)
+        Path to the directory where the region's rasterized shape is cached on
+        disk. If None, it is only cached in memory.
 
     Returns
     -------
@@ -173,34 +325,29 @@ def get_mask(shaperecord,
         Array representing the image.
 
     """
-    # create empty plot
-    fig = plt.figure()
-    ax = plt.Axes(fig, [0., 0., 1., 1.])
-    ax.set_axis_off()
-    ax.margins(x=0, y=0, tight=True)
-    fig.add_axes(ax)
-
-    # plot region
-    geometry = shaperecord.__geo_interface__["geometry"]
+    if size is None:
+        # size of matplotlib's default figure at the given DPI
+        size = (int(inches * resolution)
+                for inches in rcParams["figure.figsize"])
+    width, height = size
+    # border lines are 1 point wide, as matplotlib's default patch edges
+    line_width = max(1, round(resolution / 72))
+
+    # burn region into image, or reuse the image of an earlier call
+    pixels = rasterize_shaperecord(shaperecord, width, height,
+                                   fill=fill_colour is not None,
+                                   line_width=line_width,
+                                   cache_dir=cache_dir)
     if fill_colour is None:
-        # used to plot region borders
-        ax.add_patch(PolygonPatch(geometry, fill=False,
-                     ec=contour_colour, alpha=0.3))
+        # used to plot region borders, which are drawn 30% opaque
+        colour, alpha = contour_colour, 77
     else:
-        ax.add_patch(PolygonPatch(
-            geometry, fc=fill_colour, ec="black", alpha=1))
+        colour, alpha = fill_colour, 255
 
-    # save image in memory buffer and reshape
-    io_buf = BytesIO()
-    fig.savefig(io_buf, format='raw', dpi=resolution, transparent=True)
-    width, height = fig.get_size_inches() * resolution
-    io_buf.seek(0)
-    img_arr = frombuffer(io_buf.getvalue(), dtype=uint8)
-    img_arr = reshape(img_arr, newshape=(int(height), int(width), -1))
-
-    # close image and plot
-    io_buf.close()
-    plt.close(fig)
+    img_arr = zeros((height, width, 4), dtype=uint8)
+    img_arr[:, :, :3] = 255
+    img_arr[pixels > 0] = [round(255 * value) for value in to_rgb(colour)] \
+        + [alpha]
 
     return img_arr
 
@@ -218,7 +365,7 @@ def get_data(df,
 
     Parameters
     ----------
-    df : DataFrame
+    df : DataFrame or pyarrow.Table
         DataFrame containing columns with NUTS codes, words and word counts.
     nuts_codes : str
         Name of the column in the DataFrame containing the NUTS codes.
@@ -238,6 +385,11 @@ def get_data(df,
         the given NUTS region.
 
     """
+    if is_arrow_table(df):
+        return get_data_by_region_arrow(
+            filter_regions(df, nuts_codes, [nuts_code]), nuts_codes, words,
+            word_counts, max_words).get(nuts_code, {})
+
     # filter by nuts code, sort and select the top words
     df_temp = df.loc[df[nuts_codes] == nuts_code]\
                 .dropna(subset=[words])\
@@ -248,21 +400,137 @@ def get_data(df,
     return dic
 
 
-def plot_region(mask,
-                data,
-                ax,
-                bbox,
-                colour_func="random",
-                colour_hue=None,
-                rendering_quality=1,
-                min_font_size=4,
-                max_font_size=None,
-                max_words=200,
-                relative_scaling=0.5,
-                prefer_horizontal=0.9,
-                repeat=False):
+def get_data_by_region(df,
+                       nuts_codes,
+                       words,
+                       word_counts,
+                       max_words
+                       ):
     """
-    Plot the wordcloud for a single region.
+    Retrieve the words and their count/frequency for all NUTS codes at once.
+    The DataFrame is sorted only once instead of being filtered for each
+    region, which is considerably faster for large datasets.
+
+    Parameters
+    ----------
+    df : DataFrame or pyarrow.Table
+        DataFrame containing columns with NUTS codes, words and word counts.
+        pyarrow Tables are split into regions with Arrow's compute functions
+        (see ``get_data_by_region_arrow()``).
+    nuts_codes : str
+        Name of the column in the DataFrame containing the NUTS codes.
+    words : str
+        Name of the column in the DataFrame containing the words.
+    word_counts : str
+        Name of the column in the DataFrame containing the word counts.
+    max_words : int
+        The number of words to plot on each wordcloud.
+
+    Returns
+    -------
+    dict
+        Dictionary containing the NUTS codes as keys and, as values,
+        dictionaries containing the words as keys and their count as values
+        for the given NUTS region, as returned by ``get_data()``.
+
+    """
+    if is_arrow_table(df):
+        return get_data_by_region_arrow(df, nuts_codes, words, word_counts,
+                                        max_words)
+
+    # sort by nuts code and count and select the top words of each region
+    df_temp = df[[nuts_codes, words, word_counts]]\
+        .dropna(subset=[words])\
+        .sort_values([nuts_codes, word_counts], ascending=[True, False])\
+        .groupby(nuts_codes, sort=False)\
+        .head(max_words)
+
+    # split sorted columns at the boundaries between regions
+    codes = df_temp[nuts_codes].to_numpy()
+    region_words = df_temp[words].tolist()
+    region_counts = df_temp[word_counts].tolist()
+    starts = [0] + list(flatnonzero(codes[1:] != codes[:-1]) + 1)
+    stops = starts[1:] + [len(codes)]
+
+    return {codes[start]: dict(zip(region_words[start:stop],
+                                   region_counts[start:stop]))
+            for start, stop in zip(starts, stops) if stop > start}
+
+
+def get_region_random(random_state,
+                      nuts_id):
+    """
+    Create the random number generator of a region, derived from the seed of
+    the map and the region's NUTS code. The generator is the same whichever
+    other regions are on the map and in whichever process it is created.
+
+    Parameters
+    ----------
+    random_state : int
+        Seed of the map.
+    nuts_id : str
+        NUTS code of the region.
+
+    Returns
+    -------
+    random.Random
+        The region's random number generator.
+
+    """
+    digest = sha256(f"{random_state}:{nuts_id}".encode("utf-8")).digest()
+
+    return Random(int.from_bytes(digest[:8], "big"))
+
+
+def get_hue(colour_hue=None,
+            random_state=None):
+    """
+    Retrieve the hue in the HSL colour system used for a region's wordcloud.
+
+    Parameters
+    ----------
+    colour_hue : int or None (default = None)
+        Sets one specific hue in the HSL colour system for all regions.
+        Choose an integer between 0 and 360. If None, a random hue is chosen.
+    random_state : random.Random or None (default = None)
+        Random number generator used to choose a random hue. If None, the
+        global generator of the random module is used.
+
+    Returns
+    -------
+    int or None
+        The hue, or None if ``colour_hue`` is not between 0 and 360.
+
+    """
+    # check colour_hue input
+    if colour_hue == None:
+        # set a random hue colour
+        if random_state is None:
+            return randint(0, 360)
+        return random_state.randint(0, 360)
+    elif 0 <= colour_hue <= 360:
+        return colour_hue
+    elif 0 < colour_hue > 360:
+        print("Please choose an integer between 0 and 360")
+        return None
+
+
+def generate_region(mask,
+                    data,
+                    hue,
+                    random_state=None,
+                    colour_func="random",
+                    rendering_quality=1,
+                    min_font_size=4,
+                    max_font_size=None,
+                    max_words=200,
+                    relative_scaling=0.5,
+                    prefer_horizontal=0.9,
+                    repeat=False,
+                    layout_engine="wordcloud",
+                    profile=False):
+    """
+    Generate the wordcloud image for a single region.
 
     Parameters
     ----------
@@ -271,12 +539,12 @@ def plot_region(mask,
     data : dict
         Dictionary containing the words as keys and their count as values for
         the given NUTS region.
-    ax : matplotlib.Axes class
-        An instance of the matplotlib Axes class to which the wordcloud is
-        plotted to.
-    bbox : tuple
-        Tuple containing (minX, maxX, minY, maxY) bounding box values of the
-        region.
+    hue : int
+        Hue in the HSL colour system used for all words of the region. See
+        ``get_hue()``.
+    random_state : int or None (default = None)
+        Seed of the random number generator used to place and colour the
+        words. If None, the wordcloud differs every time it is generated.
     colour_func : str (default = "random")
         String indicating which colour function to use. Available values:
         ``"random"`` sets a random luminosity to each word within a region,
@@ -285,9 +553,6 @@ def plot_region(mask,
         luminosity of 50,
          ``"rank"`` set the luminosity of each word according to their rank,
         where the word with rank=1 receives the max luminosity of 50.
-    colour_hue : int or None (default = None)
-        Sets one specific hue in the HSL colour system for all regions.
-        Choose an integer between 0 and 360.
     rendering_quality : int (default = 1)
         The rendering quality of the words in the wordcloud. Higher values
         produce better-looking / sharper words but take longer to run.
@@ -316,17 +581,30 @@ def plot_region(mask,
     repeat : bool (default = False)
         Whether to repeat already-placed words until ``max_words`` or
         ``min_font_size`` is reached.
+    layout_engine : str or callable (default = "wordcloud")
+        How the words are placed within the regions. ``"wordcloud"`` uses
+        WordCloud's placement. ``"numpy"`` uses ``place_words()``, which
+        searches all positions of a word at once and is faster, especially
+        for many words. A callable with the same parameters as
+        ``place_words()`` returning a layout (see ``get_layout()``) can be
+        given to place words differently.
+    profile : bool (default = False)
+        Whether to also return the layout of the wordcloud and the time taken.
+
+    Returns
+    -------
+    ndarray or None
+        RGBA image array of the wordcloud, or None if the region has no words
+        or is too small to fit any of them.
+    layout : dict or None
+        Layout of the wordcloud (see ``get_layout()``), or None if the region
+        has no wordcloud. Only returned if ``profile = True``.
+    duration : float
+        Time taken to generate the wordcloud in seconds. Only returned if
+        ``profile = True``.
 
     """
-    # check colour_hue input
-    if colour_hue == None:
-        # set a random hue colour
-        hue = randint(0, 360)
-    elif 0 <= colour_hue <= 360:
-        hue = colour_hue
-    elif 0 < colour_hue > 360:
-        print("Please choose an integer between 0 and 360")
-        return
+    start = perf_counter()
 
     def colour_func_random(word,
                            **kwargs):
@@ -350,15 +628,17 @@ def plot_region(mask,
 
         """
         sat = 100
-        lum = randint(25, 50)  # prevents being too bright or too dark
+        # prevents being too bright or too dark
+        lum = kwargs["random_state"].randint(25, 50)
 
         return "hsl({}, {}%, {}%)".format(hue, sat, lum)
 
-    def colour_func_frequency(word,
-                              **kwargs):
+    def colour_func_table(word,
+                          **kwargs):
         """
-        Set the luminosity of each word according to their frequency/word
-        count, where the most frequent word receives the max luminosity of 50.
+        Look up the colour of each word in the region's colour table, which is
+        calculated once per region according to the words' frequency/word
+        count or rank.
 
         Parameters
         ----------
@@ -376,65 +656,39 @@ def plot_region(mask,
             String containing HSL colour values.
 
         """
-        # normalise frequencies
-        data_norm = (fromiter(data.values(), dtype=float)
-                     - min(data.values())) \
-            / (max(data.values()) - min(data.values()))
-
-        # get index of the current word
-        word_index = list(data.keys()).index(word)
-
-        # set saturation and luminosity values
-        sat = 100
-        lum = 50 * data_norm[word_index]
-
-        return "hsl({}, {}%, {}%)".format(hue, sat, lum)
-
-    def colour_func_rank(word,
-                         **kwargs):
-        """
-        Set the luminosity of each word according to their rank, where the
-        word with rank=1 receives the max luminosity of 50.
-
-        Parameters
-        ----------
-        word : str
-            The word being plotted.
-
-        Other Parameters
-        ----------------
-        **kwargs
-            Keyword arguments passed to the colour function of the wordcloud.
-
-        Returns
-        -------
-        str
-            String containing HSL colour values.
-
-        """
-        # sort according to ascending values
-        data_ranked = {k: v for k, v in sorted(data.items(),
-                                               key=lambda item: item[1])}
-
-        # get index of the current word
-        word_index = list(data_ranked.keys()).index(word)
-
-        # set saturation and luminosity values
-        sat = 100
-        lum = (50 * word_index) / len(data_ranked)
-
-        return "hsl({}, {}%, {}%)".format(hue, sat, lum)
+        return colour_table[word]
 
     # set colour function according to user input
     if colour_func == "random":
         func = colour_func_random
-    elif colour_func == "frequency":
-        func = colour_func_frequency
-    elif colour_func == "rank":
-        func = colour_func_rank
-
-    # create wordcloud
+    elif colour_func in ("frequency", "rank"):
+        colour_table = get_colour_table(data, hue, colour_func)
+        func = colour_func_table
+
+    if layout_engine != "wordcloud":
+        engine = place_words if layout_engine == "numpy" else layout_engine
+        try:
+            layout = engine(mask, data, func,
+                            min_font_size=min_font_size,
+                            max_font_size=max_font_size,
+                            max_words=max_words,
+                            relative_scaling=relative_scaling,
+                            prefer_horizontal=prefer_horizontal,
+                            repeat=repeat,
+                            random_state=random_state)
+            img_array = render_layout(layout, rendering_quality)
+        except ValueError:
+            # no words to plot or region too small to fit any of them
+            layout = img_array = None
+
+        if profile:
+            return img_array, layout, perf_counter() - start
+        return img_array
+
+    # create wordcloud, starting the search for the largest font size at
+    # the height of small masks instead of WordCloud's default of 200 pixels
     wc = WordCloud(mask=mask,
+                   height=min(200, mask.shape[0]),
                    background_color=None,
                    mode="RGBA",
                    scale=rendering_quality,
@@ -444,17 +698,194 @@ def plot_region(mask,
                    max_words=max_words,
                    relative_scaling=relative_scaling,
                    prefer_horizontal=prefer_horizontal,
-                   repeat=repeat
+                   repeat=repeat,
+                   random_state=random_state
                    )
 
-    wc.generate_from_frequencies(data)
+    try:
+        wc.generate_from_frequencies(data)
+        img_array = wc.to_array()
+    except ValueError:
+        # no words to plot or region too small to fit any of them
+        img_array = None
+
+    if profile:
+        layout = get_layout(wc) if img_array is not None else None
+        return img_array, layout, perf_counter() - start
 
-    img_array = wc.to_array()
-    ax.imshow(img_array, extent=bbox, origin='upper',
-              aspect=None, interpolation='antialiased')
+    return img_array
 
 
-def plot_contour(shaperecord, ax, bbox, resolution=100):
+def generate_regions(masks,
+                     data,
+                     hues,
+                     random_states,
+                     n_jobs=1,
+                     **kwargs):
+    """
+    Generate the wordcloud images for several regions, optionally in parallel
+    worker processes. Since each region is generated from its own random
+    seed, the images do not depend on the number of workers.
+
+    Parameters
+    ----------
+    masks : list of ndarray
+        The image arrays to use as masks of the wordclouds.
+    data : list of dict
+        Dictionaries containing the words as keys and their count as values
+        for each region.
+    hues : list of int or None
+        Hue in the HSL colour system of each region. Regions whose hue is None
+        are not generated.
+    random_states : list of int
+        Seed of the random number generator of each region.
+    n_jobs : int or None (default = 1)
+        Number of worker processes. If 1 or None, the regions are generated in
+        the current process. If -1, one worker per CPU is used.
+
+    Other Parameters
+    ----------------
+    **kwargs
+        Keyword arguments passed to ``generate_region()``.
+
+    Returns
+    -------
+    list of ndarray or None
+        RGBA image array of each region's wordcloud, or None if the region was
+        not generated. If ``profile = True`` is passed to
+        ``generate_region()``, the tuples it returns instead of the arrays.
+
+    """
+    generate = partial(generate_region, **kwargs)
+    regions = [i for i, hue in enumerate(hues) if hue is not None]
+    arguments = [[masks[i] for i in regions],
+                 [data[i] for i in regions],
+                 [hues[i] for i in regions],
+                 [random_states[i] for i in regions]]
+
+    if n_jobs == -1:
+        n_jobs = cpu_count()
+    if n_jobs is None or n_jobs == 1 or len(regions) <= 1:
+        images = list(map(generate, *arguments))
+    else:
+        with ProcessPoolExecutor(
+                max_workers=min(n_jobs, len(regions))) as executor:
+            images = list(executor.map(generate, *arguments))
+
+    img_arrays = [None] * len(hues)
+    for i, img_array in zip(regions, images):
+        img_arrays[i] = img_array
+
+    return img_arrays
+
+
+def plot_region(mask,
+                data,
+                ax,
+                bbox,
+                colour_func="random",
+                colour_hue=None,
+                rendering_quality=1,
+                min_font_size=4,
+                max_font_size=None,
+                max_words=200,
+                relative_scaling=0.5,
+                prefer_horizontal=0.9,
+                repeat=False,
+                random_state=None,
+                layout_engine="wordcloud"):
+    """
+    Plot the wordcloud for a single region.
+
+    Parameters
+    ----------
+    mask : ndarray
+        The image array to use as mask (i.e. shape) of the wordcloud.
+    data : dict
+        Dictionary containing the words as keys and their count as values for
+        the given NUTS region.
+    ax : matplotlib.Axes class
+        An instance of the matplotlib Axes class to which the wordcloud is
+        plotted to.
+    bbox : tuple
+        Tuple containing (minX, maxX, minY, maxY) bounding box values of the
+        region.
+    colour_func : str (default = "random")
+        String indicating which colour function to use. Available values:
+        ``"random"`` sets a random luminosity to each word within a region,
+        ``"frequency"`` sets the luminosity of each word according to their
+        frequency/word count, where the most frequent word receives the max
+        luminosity of 50,
+         ``"rank"`` set the luminosity of each word according to their rank,
+        where the word with rank=1 receives the max luminosity of 50.
+    colour_hue : int or None (default = None)
+        Sets one specific hue in the HSL colour system for all regions.
+        Choose an integer between 0 and 360.
+    rendering_quality : int (default = 1)
+        The rendering quality of the words in the wordcloud. Higher values
+        produce better-looking / sharper words but take longer to run.
+    min_font_size : int (default = 4)
+        Smallest font size to use. Word placement will stop when there is no
+        more room to fit words of this size.
+    max_font_size : int or None (default = None)
+        Maximum font size for the largest word. If None, a relative sizing
+        based on the height of the image is used.
+    max_words : int (default = 200)
+        Maximum number of words to be included in wordcloud for each region.
+    relative_scaling : float (default = 'auto')
+        Importance of relative word frequencies for font-size. With
+        ``relative_scaling = 0``, only the ranking of words is considered. With
+        ``relative_scaling = 1``, a word that is twice as frequent will have
+        twice the size. In datasets with highly uneven word frequencies,
+        relative_scaling = 1 might lead to very few words being fitted, so a
+        value of around 0.5 often looks better. If ``relative_scaling =
+        'auto'`` it will be set to 0.5 unless ``repeat = True``, in which case
+        it will be set to 0.
+    prefer_horizontal : float (default = 0.9)
+        The ratio of times to try horizontal fitting as opposed to vertical. If
+        ``prefer_horizontal = 1``, no words will be placed vertically. If
+        ``prefer_horizontal < 1``, the algorithm will try rotating the word if
+        it doesn't fit.
+    repeat : bool (default = False)
+        Whether to repeat already-placed words until ``max_words`` or
+        ``min_font_size`` is reached.
+    random_state : int or None (default = None)
+        Seed of the random number generator used to place and colour the
+        words and to choose a random hue. If None, the wordcloud differs every
+        time it is plotted.
+    layout_engine : str or callable (default = "wordcloud")
+        How the words are placed within the regions. ``"wordcloud"`` uses
+        WordCloud's placement. ``"numpy"`` uses ``place_words()``, which
+        searches all positions of a word at once and is faster, especially
+        for many words. A callable with the same parameters as
+        ``place_words()`` returning a layout (see ``get_layout()``) can be
+        given to place words differently.
+
+    """
+    hue = get_hue(colour_hue,
+                  None if random_state is None else Random(random_state))
+    if hue is None:
+        return
+
+    img_array = generate_region(mask,
+                                data,
+                                hue,
+                                random_state=random_state,
+                                colour_func=colour_func,
+                                rendering_quality=rendering_quality,
+                                min_font_size=min_font_size,
+                                max_font_size=max_font_size,
+                                max_words=max_words,
+                                relative_scaling=relative_scaling,
+                                prefer_horizontal=prefer_horizontal,
+                                repeat=repeat,
+                                layout_engine=layout_engine)
+    if img_array is not None:
+        ax.imshow(img_array, extent=bbox, origin='upper',
+                  aspect=None, interpolation='antialiased')
+
+
+def plot_contour(shaperecord, ax, bbox, resolution=100, cache_dir=None):
     """
     Plot the borders of the regions on the map.
 
@@ -472,12 +903,627 @@ def plot_contour(shaperecord, ax, bbox, resolution=100):
     resolution : str (default = 100)
         DPI (dots per inch) value used to generate mask image. Higher values
         create sharper regional border lines but take longer to run.
+    cache_dir : str or None (default = None)
+        Path to the directory where the region's rasterized borders are cached
+        on disk. If None, they are only cached in memory.
+
+    Returns
+    -------
+    matplotlib.image.AxesImage
+        The image of the borders added to the Axes.
 
     """
     contour = get_mask(shaperecord, fill_colour=None,
-                       contour_colour="black", resolution=resolution)
-    ax.imshow(contour, extent=bbox, origin='upper',
-              aspect=None, interpolation='antialiased')
+                       contour_colour="black", resolution=resolution,
+                       cache_dir=cache_dir)
+    return ax.imshow(contour, extent=bbox, origin='upper',
+                     aspect=None, interpolation='antialiased')
+
+
+def plot_contours(shaperecords,
+                  ax,
+                  contour_colour="black",
+                  line_width=None):
+    """
+    Plot the borders of the regions on the map as vector lines. All borders
+    are drawn as a single collection of lines, which stay sharp at any
+    resolution and in vector formats such as SVG or PDF.
+
+    Parameters
+    ----------
+    shaperecords : list of shapefile.ShapeRecord
+        ShapeRecord objects of the regions plotted on the map.
+    ax : matplotlib.Axes class
+        An instance of the matplotlib Axes class to which the borders are
+        plotted to.
+    contour_colour : str (default = "black")
+        Contour colour to use when showing regional borders in final wordcloud
+        map.
+    line_width : float or None (default = None)
+        Width of the border lines in points. If None, matplotlib's default
+        line width of patches is used.
+
+    Returns
+    -------
+    matplotlib.collections.LineCollection
+        The border lines added to the Axes.
+
+    """
+    rings = [ring for shaperecord in shaperecords
+             for ring in get_rings(shaperecord.shape)]
+    if line_width is None:
+        line_width = rcParams["patch.linewidth"]
+
+    return ax.add_collection(LineCollection(rings, colors=contour_colour,
+                                            linewidths=line_width, alpha=0.3),
+                             autolim=False)
+
+
+class WordcloudMapRenderer:
+    """
+    Stateful renderer of wordcloud maps. The shapefiles, the regions' masks
+    and wordclouds and the figure are kept between calls to ``render()``, so
+    that rendering updated data only generates the wordclouds of the regions
+    whose words or word counts changed.
+
+    Parameters
+    ----------
+    nuts_codes : str
+        Name of the column in the DataFrames containing the NUTS codes.
+    words : str
+        Name of the column in the DataFrames containing the words.
+    word_counts : str
+        Name of the column in the DataFrames containing the word counts.
+
+    Other Parameters
+    ----------------
+    **kwargs
+        All other parameters of ``wordcloud_map()``, with the same defaults.
+
+    """
+
+    def __init__(self,
+                 nuts_codes,
+                 words,
+                 word_counts,
+                 scale=2.0,
+                 rendering_quality=1,
+                 colour_func="random",
+                 colour_hue=None,
+                 min_font_size=4,
+                 max_font_size=None,
+                 max_words=200,
+                 relative_scaling=0.5,
+                 prefer_horizontal=0.9,
+                 repeat=False,
+                 border_scale="01M",
+                 border_sharpness=100,
+                 nuts_year=2021,
+                 coord_system=3857,
+                 shapefiles_path=None,
+                 cache_dir=None,
+                 offline=False,
+                 geometry_index=None,
+                 mask_size="bbox",
+                 mask_pixels_per_unit=None,
+                 n_jobs=1,
+                 border_mode="vector",
+                 simplify=True,
+                 mask_cache=False,
+                 compositing="canvas",
+                 callback=None,
+                 trace_memory=False,
+                 random_state=None,
+                 result_cache=False,
+                 result_cache_size=DEFAULT_MAX_CACHE_SIZE,
+                 layouts=None,
+                 layout_engine="wordcloud",
+                 regions=None):
+        if mask_size not in ("bbox", "fixed"):
+            raise ValueError(
+                f"mask_size must be 'bbox' or 'fixed', got {mask_size!r}.")
+        if border_mode not in ("vector", "raster"):
+            raise ValueError(
+                "border_mode must be 'vector' or 'raster', "
+                f"got {border_mode!r}.")
+        if compositing not in ("canvas", "layers", "vector"):
+            raise ValueError(
+                "compositing must be 'canvas', 'layers' or 'vector', "
+                f"got {compositing!r}.")
+        if compositing == "vector" and (
+                mask_size != "bbox"
+                or isinstance(mask_pixels_per_unit, tuple)
+                and mask_pixels_per_unit[0] != mask_pixels_per_unit[1]):
+            raise ValueError(
+                "compositing = 'vector' needs masks with the aspect ratio of "
+                "the regions, i.e. mask_size = 'bbox' and the same "
+                "mask_pixels_per_unit along both axes.")
+        if layout_engine not in ("wordcloud", "numpy") \
+                and not callable(layout_engine):
+            raise ValueError(
+                "layout_engine must be 'wordcloud', 'numpy' or a callable, "
+                f"got {layout_engine!r}.")
+
+        self.nuts_codes = nuts_codes
+        self.words = words
+        self.word_counts = word_counts
+        self.scale = scale
+        self.rendering_quality = rendering_quality
+        self.colour_func = colour_func
+        self.colour_hue = colour_hue
+        self.min_font_size = min_font_size
+        self.max_font_size = max_font_size
+        self.max_words = max_words
+        self.relative_scaling = relative_scaling
+        self.prefer_horizontal = prefer_horizontal
+        self.repeat = repeat
+        self.border_scale = border_scale
+        self.border_sharpness = border_sharpness
+        self.nuts_year = nuts_year
+        self.coord_system = coord_system
+        self.shapefiles_path = shapefiles_path
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.geometry_index = geometry_index
+        self.mask_size = mask_size
+        self.mask_pixels_per_unit = mask_pixels_per_unit
+        self.n_jobs = n_jobs
+        self.border_mode = border_mode
+        self.simplify = simplify
+        self.mask_cache = mask_cache
+        self.compositing = compositing
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self.random_state = random_state
+        self.result_cache = result_cache
+        self.result_cache_size = result_cache_size
+        if isinstance(layouts, str):
+            layouts = load_layouts(layouts)
+        self.layouts = dict(layouts or {})
+        self.layout_engine = layout_engine
+        self.regions_filter = regions
+
+        self.shapefiles = None
+        self.fig = None
+        self.ax = None
+        self.codes = None
+        self.regions = {}
+        self.canvas = None
+        self.canvas_image = None
+        self.stats = RenderStats(callback)
+
+    def get_shapefiles(self):
+        """
+        Retrieve the shapefiles of the NUTS regions, loading them only once.
+
+        Returns
+        -------
+        shapefile.Reader or GeometryIndex
+            Reader object of shapefile module containing shapefiles of NUTS
+            regions or geometry index of NUTS regions.
+
+        """
+        if self.shapefiles is None:
+            with self.stats.stage("shapefiles"):
+                if self.geometry_index is not None:
+                    self.shapefiles = GeometryIndex(self.geometry_index)
+                elif self.shapefiles_path is not None:
+                    self.shapefiles = Reader(self.shapefiles_path)
+                else:
+                    self.shapefiles = download_shapefiles(
+                        self.border_scale, self.nuts_year, self.coord_system,
+                        cache_dir=self.cache_dir, offline=self.offline)
+
+        return self.shapefiles
+
+    def create_map(self,
+                   unique_codes):
+        """
+        Create the base map for the given regions: the figure, the regions'
+        masks and their border lines and, when compositing on a canvas, the
+        canvas and its image.
+
+        Parameters
+        ----------
+        unique_codes : ndarray
+            Array containing unique NUTS codes.
+
+        """
+        if self.fig is not None:
+            plt.close(self.fig)
+
+        shapefiles = self.get_shapefiles()
+        with self.stats.stage("shaperecords"):
+            shaperecords = get_shaperecords(shapefiles, unique_codes)
+            Xmin, Ymin, Xmax, Ymax = get_bbox_map(shaperecords)
+
+        with self.stats.stage("figure"):
+            fig = plt.figure()
+            ax = plt.Axes(fig, [0., 0., 1., 1.])
+            ax.set_axis_off()
+            ax.margins(x=0, y=0, tight=True)
+            fig.add_axes(ax)
+            ax.set_xlim(Xmin, Xmax)
+            ax.set_ylim(Ymin, Ymax)
+
+            # get current size and multiply that by the given scale
+            fig.set_size_inches(fig.get_size_inches() * self.scale)
+
+            # the map keeps the aspect ratio of images, so it only fills the
+            # figure along one axis
+            ax.set_aspect(rcParams["image.aspect"])
+            pixels_per_unit = get_pixels_per_unit(ax)
+            extent = ax.get_window_extent()
+            # the canvas is supersampled like the words, and smoothed down
+            # to the figure's pixels when it is drawn
+            width = round(extent.width * self.rendering_quality)
+            height = round(extent.height * self.rendering_quality)
+            if self.compositing == "canvas":
+                self.canvas = zeros((height, width, 4), dtype=float32)
+                self.canvas_image = ax.imshow(
+                    zeros((height, width, 4), dtype=uint8),
+                    extent=(Xmin, Xmax, Ymin, Ymax), origin='upper',
+                    aspect=None, interpolation='antialiased', zorder=0)
+
+        mask_pixels_per_unit = self.mask_pixels_per_unit
+        if mask_pixels_per_unit is None:
+            mask_pixels_per_unit = pixels_per_unit
+
+        with self.stats.stage("simplify"):
+            if self.simplify:
+                tolerance = get_tolerance(pixels_per_unit)
+                if self.mask_size == "bbox":
+                    tolerance = min(tolerance,
+                                    get_tolerance(mask_pixels_per_unit))
+                shapes = [simplify_shaperecord(shaperecord, tolerance)
+                          for shaperecord in shaperecords]
+            else:
+                shapes = shaperecords
+
+        mask_cache_dir = None
+        if self.mask_cache:
+            mask_cache_dir = path.join(get_cache_dir(self.cache_dir), "masks")
+
+        # wordclouds are drawn above the borders of their own region, but
+        # below the borders of the regions drawn after them
+        self.regions = {}
+        with self.stats.stage("masks"):
+            for i, shape in enumerate(shapes):
+                start = perf_counter()
+                if self.mask_size == "bbox":
+                    size = get_mask_size(shape, mask_pixels_per_unit)
+                else:
+                    size = None
+                bbox = get_bbox_region(shape)
+                mask = get_mask(shape, resolution=100, size=size,
+                                cache_dir=mask_cache_dir)
+                if self.random_state is None:
+                    region_random = None
+                    seed = randint(0, 2**32 - 1)
+                else:
+                    region_random = get_region_random(self.random_state,
+                                                      shape.record.NUTS_ID)
+                    seed = region_random.randint(0, 2**32 - 1)
+                self.regions[shape.record.NUTS_ID] = {
+                    "bbox": bbox,
+                    "box": get_pixel_box(bbox, (Xmin, Ymin, Xmax, Ymax),
+                                         width, height),
+                    "mask": mask,
+                    "hue": get_hue(self.colour_hue, region_random),
+                    "random_state": seed,
+                    "zorder": 2 * i + 1,
+                    "data": None,
+                    "image": None,
+                    "tile": None,
+                    "contour": None,
+                    "layout": None,
+                    "texts": []}
+                self.stats.record("mask", perf_counter() - start,
+                                  shape.record.NUTS_ID,
+                                  mask_size=mask.shape[1::-1],
+                                  mask_pixels=int((mask[:, :, 3] > 0).sum()))
+
+        with self.stats.stage("borders"):
+            for i, (shaperecord, region) in enumerate(
+                    zip(shaperecords, self.regions.values())):
+                if self.border_mode != "raster":
+                    break
+                elif self.compositing == "canvas":
+                    # rasterize borders 1 point wide at their size on the
+                    # canvas, supersampled if border_sharpness is larger
+                    # than the canvas' DPI
+                    dpi = fig.dpi * self.rendering_quality
+                    factor = max(1, self.border_sharpness / dpi)
+                    size = region["box"][2:]
+                    region["contour"] = resize_tile(get_mask(
+                        shaperecord, fill_colour=None,
+                        resolution=factor * dpi,
+                        size=[round(value * factor) for value in size],
+                        cache_dir=mask_cache_dir), size)
+                else:
+                    contour = plot_contour(shaperecord,
+                                           ax,
+                                           region["bbox"],
+                                           resolution=self.border_sharpness,
+                                           cache_dir=mask_cache_dir)
+                    contour.set_zorder(2 * i)
+
+            if self.border_mode == "vector":
+                plot_contours(shapes, ax).set_zorder(2 * len(shapes))
+
+        self.fig, self.ax, self.codes = fig, ax, set(unique_codes)
+
+    def render(self,
+               df):
+        """
+        Render the wordcloud map of a DataFrame. Regions whose words and word
+        counts are the same as in the previous call are not generated again.
+        Statistics about rendering are kept in the ``stats`` attribute (see
+        ``RenderStats``).
+
+        Parameters
+        ----------
+        df : DataFrame, pyarrow.Table or str
+            DataFrame object containing columns with NUTS codes, words and
+            word counts, or a pyarrow Table or the path to a Parquet file or
+            dataset containing them.
+
+        Returns
+        -------
+        matplotlib.figure.Figure
+            The wordcloud map as a matplotlib Figure object. The same Figure
+            object is updated and returned by every call, unless the NUTS
+            codes in the data change.
+
+        """
+        self.stats = RenderStats(self.callback)
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif self.trace_memory and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+        try:
+            self.render_map(df)
+            if self.trace_memory:
+                self.stats.peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            if tracing:
+                tracemalloc.stop()
+
+        width, height = self.fig.get_size_inches() * self.fig.dpi
+        self.stats.width, self.stats.height = int(width), int(height)
+
+        return self.fig
+
+    def render_map(self,
+                   df):
+        """
+        Render the wordcloud map of a DataFrame, recording statistics in the
+        ``stats`` attribute. See ``render()``.
+
+        Parameters
+        ----------
+        df : DataFrame, pyarrow.Table or str
+            DataFrame object containing columns with NUTS codes, words and
+            word counts, or a pyarrow Table or the path to a Parquet file or
+            dataset containing them.
+
+        """
+        if isinstance(df, (str, PathLike)):
+            with self.stats.stage("read"):
+                df = read_parquet_table(df, [self.nuts_codes, self.words,
+                                             self.word_counts],
+                                        self.nuts_codes, self.regions_filter)
+        elif self.regions_filter is not None:
+            df = filter_regions(df, self.nuts_codes, self.regions_filter)
+
+        unique_codes = get_unique_codes(df, self.nuts_codes)
+        if self.fig is None or set(unique_codes) != self.codes:
+            self.create_map(unique_codes)
+
+        with self.stats.stage("data"):
+            data_by_region = get_data_by_region(df,
+                                                self.nuts_codes,
+                                                self.words,
+                                                self.word_counts,
+                                                self.max_words)
+
+            # find regions whose words or word counts changed
+            changed = {}
+            for nuts_id, region in self.regions.items():
+                data = data_by_region.get(nuts_id, {})
+                if region["data"] is None \
+                        or list(data.items()) != list(region["data"].items()):
+                    changed[nuts_id] = data
+
+        regions = [self.regions[nuts_id] for nuts_id in changed]
+        options = dict(colour_func=self.colour_func,
+                       rendering_quality=self.rendering_quality,
+                       min_font_size=self.min_font_size,
+                       max_font_size=self.max_font_size,
+                       max_words=self.max_words,
+                       relative_scaling=self.relative_scaling,
+                       prefer_horizontal=self.prefer_horizontal,
+                       repeat=self.repeat,
+                       layout_engine=self.layout_engine)
+
+        # draw regions with a given layout from it, at the mask's scale,
+        # unless their data changed since, which is drawn from then on
+        replayed = {}
+        if self.layouts:
+            with self.stats.stage("wordclouds"):
+                for nuts_id in changed:
+                    layout = self.layouts.get(nuts_id)
+                    if layout is None:
+                        continue
+                    if not matches_layout(layout, changed[nuts_id]):
+                        del self.layouts[nuts_id]
+                        continue
+                    start = perf_counter()
+                    scale = self.regions[nuts_id]["mask"].shape[1] \
+                        / layout["size"][0] * self.rendering_quality
+                    replayed[nuts_id] = (render_layout(layout, scale), layout,
+                                         perf_counter() - start)
+
+        # look up wordclouds generated before from the same inputs, which
+        # only exist for maps with a random_state
+        cached, keys = {}, {}
+        if self.result_cache and self.random_state is not None:
+            with self.stats.stage("result_cache"):
+                result_cache_dir = path.join(get_cache_dir(self.cache_dir),
+                                             "results")
+                for nuts_id, region in zip(changed, regions):
+                    if nuts_id in replayed:
+                        continue
+                    keys[nuts_id] = get_result_key(region["mask"],
+                                                   changed[nuts_id],
+                                                   region["hue"],
+                                                   region["random_state"],
+                                                   **options)
+                    result = load_result(result_cache_dir, keys[nuts_id])
+                    if result is not None:
+                        cached[nuts_id] = result
+
+        missing = [nuts_id for nuts_id in changed
+                   if nuts_id not in cached and nuts_id not in replayed]
+        with self.stats.stage("wordclouds"):
+            results = generate_regions(
+                [self.regions[nuts_id]["mask"] for nuts_id in missing],
+                [changed[nuts_id] for nuts_id in missing],
+                [self.regions[nuts_id]["hue"] for nuts_id in missing],
+                [self.regions[nuts_id]["random_state"] for nuts_id in missing],
+                n_jobs=self.n_jobs,
+                profile=True,
+                **options)
+        generated = dict(zip(missing, results))
+
+        img_arrays = []
+        for nuts_id, data in changed.items():
+            if nuts_id in replayed:
+                img_array, layout, duration = replayed[nuts_id]
+            elif nuts_id in cached:
+                img_array, layout = cached[nuts_id]
+                duration = 0.0
+            else:
+                img_array, layout, duration = \
+                    generated[nuts_id] or (None, None, 0.0)
+            if layout is not None and nuts_id not in replayed:
+                layout = {**layout, "data": get_data_digest(data)}
+            img_arrays.append(img_array)
+            self.regions[nuts_id]["layout"] = layout
+            self.stats.record("wordcloud", duration, nuts_id,
+                              words_requested=len(data),
+                              words_placed=len(layout["words"]) if layout
+                              else 0,
+                              cached=nuts_id in cached,
+                              replayed=nuts_id in replayed)
+
+        if keys:
+            with self.stats.stage("result_cache"):
+                # regions that were not generated (without hue) are skipped
+                store_results(result_cache_dir,
+                              {keys[nuts_id]: result[:2]
+                               for nuts_id, result in generated.items()
+                               if result is not None},
+                              self.result_cache_size)
+
+        with self.stats.stage("composite"):
+            self.composite_regions(regions, list(changed.values()),
+                                   img_arrays)
+
+    def composite_regions(self,
+                          regions,
+                          data,
+                          img_arrays):
+        """
+        Replace the wordclouds of the changed regions on the map.
+
+        Parameters
+        ----------
+        regions : list of dict
+            The changed regions.
+        data : list of dict
+            Dictionaries containing the words as keys and their count as
+            values for each changed region.
+        img_arrays : list of ndarray or None
+            RGBA image array of each changed region's wordcloud, or None if
+            the region has no wordcloud.
+
+        """
+        for region, region_data, img_array in zip(regions, data, img_arrays):
+            region["data"] = region_data
+            if self.compositing == "vector":
+                for text in region["texts"]:
+                    text.remove()
+                region["texts"] = []
+                if region["layout"] is not None:
+                    region["texts"] = plot_layout(region["layout"], self.ax,
+                                                  region["bbox"],
+                                                  zorder=region["zorder"])
+                continue
+            if self.compositing == "canvas":
+                if img_array is None:
+                    region["tile"] = None
+                else:
+                    region["tile"] = resize_tile(img_array, region["box"][2:])
+                continue
+
+            if region["image"] is not None:
+                region["image"].remove()
+                region["image"] = None
+            if img_array is not None:
+                region["image"] = self.ax.imshow(
+                    img_array, extent=region["bbox"], origin='upper',
+                    aspect=None, interpolation='antialiased',
+                    zorder=region["zorder"])
+
+        if self.compositing == "canvas":
+            # blend all regions onto the canvas, in the same order as layers
+            tiles = []
+            for region in self.regions.values():
+                left, top = region["box"][:2]
+                for tile in (region["contour"], region["tile"]):
+                    if tile is not None:
+                        tiles.append((tile, left, top))
+            height, width = self.canvas.shape[:2]
+            self.canvas_image.set_data(
+                composite(tiles, width, height, canvas=self.canvas))
+
+    def get_layouts(self):
+        """
+        Retrieve the layouts of the regions' wordclouds, which can be saved
+        with ``save_layouts()`` and used to draw the map again without
+        placing the words again, e.g. at a larger scale.
+
+        Returns
+        -------
+        dict
+            Dictionary containing the NUTS codes of the regions as keys and
+            their layouts as values (see ``get_layout()``), which also hold
+            the digest of the words and word counts they were made for in
+            ``"data"`` (see ``get_data_digest()``). Regions without wordcloud
+            are left out.
+
+        """
+        return {nuts_id: region["layout"]
+                for nuts_id, region in self.regions.items()
+                if region["layout"] is not None}
+
+    def close(self):
+        """
+        Close the figure, so that the next call to ``render()`` creates a new
+        one. The shapefiles stay loaded.
+
+        """
+        if self.fig is not None:
+            plt.close(self.fig)
+        self.fig = None
+        self.ax = None
+        self.codes = None
+        self.regions = {}
+        self.canvas = None
+        self.canvas_image = None
 
 
 def wordcloud_map(df,
@@ -498,16 +1544,38 @@ def wordcloud_map(df,
                   border_sharpness=100,
                   nuts_year=2021,
                   coord_system=3857,
-                  shapefiles_path=None
+                  shapefiles_path=None,
+                  cache_dir=None,
+                  offline=False,
+                  geometry_index=None,
+                  mask_size="bbox",
+                  mask_pixels_per_unit=None,
+                  n_jobs=1,
+                  border_mode="vector",
+                  simplify=True,
+                  mask_cache=False,
+                  compositing="canvas",
+                  callback=None,
+                  trace_memory=False,
+                  return_stats=False,
+                  random_state=None,
+                  result_cache=False,
+                  result_cache_size=DEFAULT_MAX_CACHE_SIZE,
+                  layouts=None,
+                  export_layouts=None,
+                  layout_engine="wordcloud",
+                  regions=None
                   ):
     """
     Create a wordcloud map using data from a DataFrame.
 
     Parameters
     ----------
-    df : DataFrame
+    df : DataFrame, pyarrow.Table or str
         DataFrame object containing columns with NUTS codes, words and word
-        counts.
+        counts. A pyarrow Table or the path to a Parquet file or dataset can
+        be given instead, which requires pyarrow. Only the three columns are
+        read from Parquet files, and only the rows of ``regions`` if given.
     nuts_codes : str
         Name of the column in the DataFrame containing the NUTS codes.
     words : str
@@ -579,7 +1647,10 @@ def wordcloud_map(df,
         sharper regional border lines but might take considerably longer to
         run. Change to higher values if zooming into the map is necessary.
         The value used relates to the DPI (dots per inch) used when generating
-        the mask images.
+        the mask images. Only used when ``border_mode = "raster"``. With
+        ``compositing = "canvas"``, values above the canvas' DPI (the
+        figure's DPI times ``rendering_quality``) draw the borders at that
+        DPI and smooth them down to the canvas.
     nuts_year : int (default = 2021)
         The year of NUTS regulation, e.g. 2021, 2016, 2013, 2010, 2006 or 2003.
     coord_system : int (default = 3857)
@@ -594,64 +1665,261 @@ def wordcloud_map(df,
         limited. Works with .shp or .zip files.
         To get local files, visit:
         https://ec.europa.eu/eurostat/de/web/gisco/geodata/reference-data/administrative-units-statistical-units/nuts
+    cache_dir : str or None (default = None)
+        Path to the directory where downloaded shapefiles are cached, so they
+        are only downloaded once. If None, the path given by the
+        ``WORDCLOUD_MAPPER_CACHE`` environment variable is used or, if that is
+        not set, ``~/.cache/wordcloud_mapper``.
+    offline : bool (default = False)
+        If True, never download shapefiles and only use the ones cached in
+        ``cache_dir``. Useful for machines without internet access, whose
+        cache can be seeded with the shapefiles downloaded from GISCO.
+    geometry_index : str or None (default = None)
+        Reads the regions' shapes from a geometry index created with
+        ``build_geometry_index()`` instead of from shapefiles. Only the shapes
+        of the regions in the DataFrame are read, which is considerably faster
+        than parsing the whole shapefiles.
+    mask_size : str (default = "bbox")
+        How the size of each region's mask (i.e. the canvas the region's
+        wordcloud is generated on) is chosen. Available values:
+        ``"bbox"`` derives it from the region's bounding box, so that the mask
+        has the same aspect ratio and number of pixels as the region on the
+        final map and smaller regions take less time to run.
+        ``"fixed"`` uses matplotlib's default figure size (640x480 pixels) for
+        every region.
+    mask_pixels_per_unit : float, tuple or None (default = None)
+        Number of mask pixels per unit of the coordinate system when
+        ``mask_size = "bbox"``. A tuple sets different values for the X and Y
+        axes. If None, it is derived from the size of the map on the final
+        figure, which depends on ``scale``.
+    n_jobs : int or None (default = 1)
+        Number of worker processes used to generate the regions' wordclouds in
+        parallel. If 1 or None, all regions are generated in the current
+        process. If -1, one worker per CPU is used. The map does not depend on
+        the number of workers.
+    border_mode : str (default = "vector")
+        How the regions' border lines are drawn. Available values:
+        ``"vector"`` draws all borders as vector lines, which is fast and keeps
+        them sharp at any resolution and in vector formats (e.g. SVG or PDF).
+        ``"raster"`` draws each region's borders as an image whose sharpness
+        is set by ``border_sharpness``.
+    simplify : bool (default = True)
+        Whether to simplify the regions' shapes before using them, removing
+        details smaller than half a pixel of the final figure. Speeds up maps
+        made from detailed shapefiles (e.g. ``border_scale = "01M"``) without
+        visible changes at the figure's size.
+    mask_cache : bool (default = False)
+        Whether to cache the regions' rasterized masks on disk, in the
+        ``masks`` subdirectory of the cache directory (see ``cache_dir``),
+        in addition to caching them in memory. Repeated maps of the same
+        regions then skip rasterizing their shapes, also across sessions.
+    compositing : str (default = "canvas")
+        How the regions' wordclouds are combined into the map. ``"canvas"``
+        blends them into a single image the size of the map on the final
+        figure times ``rendering_quality``, so the figure holds one image
+        regardless of the number of regions and saves quickly. ``"layers"``
+        adds one image per region (and per region's borders if
+        ``border_mode = "raster"``) to the figure, which are resampled when
+        the figure is saved. ``"vector"`` adds the placed words as text
+        instead of images, so that they stay vector graphics in SVG or PDF
+        files and print-size maps do not need a higher ``rendering_quality``.
+        ``"vector"`` requires ``mask_size = "bbox"``.
+    callback : callable or None (default = None)
+        Function called with a dictionary describing each stage of rendering
+        as soon as it finishes, e.g. to log the progress of slow maps. See
+        ``RenderStats``.
+    trace_memory : bool (default = False)
+        Whether to trace the peak memory allocated while rendering with
+        ``tracemalloc``. Slows down rendering.
+    return_stats : bool (default = False)
+        Whether to return statistics about rendering (the duration of each
+        stage and region, the regions' mask pixels and words placed and the
+        peak memory) together with the figure, instead of printing the
+        figure's size.
+    random_state : int or None (default = None)
+        Seed of the random numbers used to choose the regions' hues and to
+        place and colour their words. Each region's random numbers are
+        derived from the seed and its NUTS code, so the same data always
+        produces the same map, whatever the number of jobs. If None, the map
+        differs every time it is produced.
+    result_cache : bool (default = False)
+        Whether to cache the regions' wordclouds on disk, in the ``results``
+        subdirectory of the cache directory (see ``cache_dir``), keyed by the
+        regions' words and word counts, shapes and all options. Regions
+        whose wordclouds are cached are not generated again, so repeating a
+        map takes a fraction of the time. Only used if ``random_state`` is
+        given, since maps without one differ every time they are produced.
+    result_cache_size : int or None (default = 1 GB)
+        Maximum size of the result cache in bytes. The least recently used
+        wordclouds are deleted when it is exceeded. If None, the cache is
+        unbounded.
+    layouts : str, dict or None (default = None)
+        Layouts of the regions' wordclouds saved before with
+        ``export_layouts``, given as the path to the JSON file or as a
+        dictionary. Regions with a layout are drawn from it instead of
+        placing their words again, which is much faster and also works at
+        another ``scale`` or ``rendering_quality``. Regions whose words or
+        word counts differ from those the layout was made for, or whose
+        layout does not record them (see ``get_layouts()``), are generated
+        again.
+    export_layouts : str or None (default = None)
+        Path to a JSON file the layouts of the regions' wordclouds (i.e. the
+        font size, position, orientation and colour of each word) are saved
+        to. See ``layouts``.
+    layout_engine : str or callable (default = "wordcloud")
+        How the words are placed within the regions. ``"wordcloud"`` uses
+        WordCloud's placement. ``"numpy"`` uses ``place_words()``, which
+        searches all positions of a word at once and is faster, especially
+        for many words. A callable with the same parameters as
+        ``place_words()`` returning a layout (see ``get_layout()``) can be
+        given to place words differently.
+    regions : list of str or None (default = None)
+        NUTS codes of the regions to plot. Rows of other regions are skipped,
+        already while reading Parquet files. If None, all regions in the data
+        are plotted.
 
     Returns
     -------
     matplotlib.figure.Figure
         The wordcloud map as a matplotlib Figure object.
+    RenderStats
+        Statistics about rendering the map. Only returned if
+        ``return_stats = True``.
 
     """
-    if shapefiles_path != None:
-        shapefiles = Reader(shapefiles_path)
-    else:
-        shapefiles = download_shapefiles(border_scale, nuts_year, coord_system)
-
-    unique_codes = get_unique_codes(df, nuts_codes)
-    Xmin, Ymin, Xmax, Ymax = get_bbox_map(shapefiles, unique_codes)
-
-    fig = plt.figure()
-    ax = plt.Axes(fig, [0., 0., 1., 1.])
-    ax.set_axis_off()
-    ax.margins(x=0, y=0, tight=True)
-    fig.add_axes(ax)
-    ax.set_xlim(Xmin, Xmax)
-    ax.set_ylim(Ymin, Ymax)
-
-    for i, shaperecord in enumerate(shapefiles.shapeRecords()):
-        if shaperecord.record.NUTS_ID in unique_codes:
-            mask = get_mask(shaperecord, resolution=100)
-            data = get_data(df,
-                            nuts_codes,
-                            words,
-                            word_counts,
-                            shaperecord.record.NUTS_ID,
-                            max_words)
-            bbox = get_bbox_region(shaperecord)
-            plot_contour(shaperecord,
-                         ax,
-                         bbox,
-                         resolution=border_sharpness)
-            plot_region(mask=mask,
-                        data=data,
-                        ax=ax,
-                        bbox=bbox,
-                        colour_func=colour_func,
-                        colour_hue=colour_hue,
-                        rendering_quality=rendering_quality,
-                        min_font_size=min_font_size,
-                        max_font_size=max_font_size,
-                        max_words=max_words,
-                        relative_scaling=relative_scaling,
-                        prefer_horizontal=prefer_horizontal,
-                        repeat=repeat
-                        )
-
-    # get current size and multiply that by the given scale
-    width, height = fig.get_size_inches()*scale
-    fig.set_size_inches(width, height)
+    renderer = WordcloudMapRenderer(nuts_codes,
+                                    words,
+                                    word_counts,
+                                    scale=scale,
+                                    rendering_quality=rendering_quality,
+                                    colour_func=colour_func,
+                                    colour_hue=colour_hue,
+                                    min_font_size=min_font_size,
+                                    max_font_size=max_font_size,
+                                    max_words=max_words,
+                                    relative_scaling=relative_scaling,
+                                    prefer_horizontal=prefer_horizontal,
+                                    repeat=repeat,
+                                    border_scale=border_scale,
+                                    border_sharpness=border_sharpness,
+                                    nuts_year=nuts_year,
+                                    coord_system=coord_system,
+                                    shapefiles_path=shapefiles_path,
+                                    cache_dir=cache_dir,
+                                    offline=offline,
+                                    geometry_index=geometry_index,
+                                    mask_size=mask_size,
+                                    mask_pixels_per_unit=mask_pixels_per_unit,
+                                    n_jobs=n_jobs,
+                                    border_mode=border_mode,
+                                    simplify=simplify,
+                                    mask_cache=mask_cache,
+                                    compositing=compositing,
+                                    callback=callback,
+                                    trace_memory=trace_memory,
+                                    random_state=random_state,
+                                    result_cache=result_cache,
+                                    result_cache_size=result_cache_size,
+                                    layouts=layouts,
+                                    layout_engine=layout_engine,
+                                    regions=regions)
+    fig = renderer.render(df)
+    if export_layouts is not None:
+        save_layouts(renderer.get_layouts(), export_layouts)
+    if return_stats:
+        return fig, renderer.stats
+
+    width, height = fig.get_size_inches()
     dpi = fig.dpi
     print(
         f"Figure successfully produced with width {int(width*dpi)}px \
 and height {int(height*dpi)}px.")
 
     return fig
+
+
+def wordcloud_map_batch(df,
+                        facet,
+                        nuts_codes,
+                        words,
+                        word_counts,
+                        format=None,
+                        return_stats=False,
+                        export_layouts=None,
+                        **kwargs):
+    """
+    Lazily create one wordcloud map per value of a facet column (e.g. one map
+    per year or per sector) of a DataFrame. The shapefiles are loaded once for
+    the whole batch, and each map is closed once the next one is requested,
+    so memory use does not grow with the number of maps.
+
+    Parameters
+    ----------
+    df : DataFrame
+        DataFrame object containing columns with the facet, NUTS codes, words
+        and word counts.
+    facet : str
+        Name of the column in the DataFrame whose values split the data into
+        one map each.
+    nuts_codes : str
+        Name of the column in the DataFrame containing the NUTS codes.
+    words : str
+        Name of the column in the DataFrame containing the words.
+    word_counts : str
+        Name of the column in the DataFrame containing the word counts.
+    format : str or None (default = None)
+        File format of the maps, e.g. ``"png"`` or ``"svg"``. If None, the
+        maps are yielded as matplotlib Figure objects, which are closed when
+        the next map is requested. Otherwise, the maps are yielded as the
+        bytes of a file in that format, and the figure, the regions' masks
+        and the wordclouds of regions whose data did not change are reused
+        between maps with the same NUTS codes.
+    return_stats : bool (default = False)
+        Whether to also yield the statistics about rendering each map. See
+        ``wordcloud_map()``.
+    export_layouts : str or None (default = None)
+        Path to the JSON files the layouts of each map's wordclouds are saved
+        to, containing ``{key}``, which is replaced by the value of the facet
+        column (e.g. ``"layouts_{key}.json"``). See ``wordcloud_map()``.
+    **kwargs
+        All other parameters of ``wordcloud_map()``.
+
+    Yields
+    ------
+    key : object
+        Value of the facet column.
+    map : matplotlib.figure.Figure or bytes
+        The wordcloud map of the rows with that value.
+    stats : RenderStats
+        Statistics about rendering the map. Only yielded if
+        ``return_stats = True``.
+
+    """
+    if export_layouts is not None and "{key}" not in export_layouts:
+        raise ValueError(
+            "export_layouts must contain '{key}', so that the layouts of "
+            f"each map are saved to their own file, got {export_layouts!r}.")
+
+    renderer = WordcloudMapRenderer(nuts_codes, words, word_counts, **kwargs)
+
+    try:
+        for key, group in df.groupby(facet):
+            fig = renderer.render(group)
+            if export_layouts is not None:
+                save_layouts(renderer.get_layouts(),
+                             export_layouts.format(key=key))
+            if format is None:
+                result = fig
+            else:
+                buffer = BytesIO()
+                fig.savefig(buffer, format=format)
+                result = buffer.getvalue()
+
+            if return_stats:
+                yield key, result, renderer.stats
+            else:
+                yield key, result
+            if format is None:
+                renderer.close()
+    finally:
+        renderer.close()